@@ -15,12 +15,26 @@ Serverless Functionとして実行します。
 技術的な詳細:
 - VercelのPython runtimeは、`handler`関数を探して実行します
 - `handler`関数は、リクエスト辞書を受け取り、レスポンス辞書を返します
-- Flaskアプリケーションは、`test_request_context`を使用して実行されます
+- Flaskアプリケーションは、WSGI environを直接構築して`wsgi_app`経由で実行されます
 """
 import sys  # システム固有のパラメータと関数
 import os  # オペレーティングシステム関連の機能
 from pathlib import Path  # パス操作のためのクラス
 import json  # JSONデータの処理
+import base64  # base64デコード
+import binascii  # base64エンコード（Cで実装された低レベル関数）
+import logging  # ログ出力
+import io  # バイトストリーム（WSGIの入力ストリーム用）
+from collections import OrderedDict  # LRUキャッシュ用の順序付き辞書
+
+# 高速なJSONシリアライザ（オプション）
+# 利用できない場合は標準のjsonモジュールを使用
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+from urllib.parse import urlencode  # クエリ文字列の構築（URLエンコード付き）
 
 # ============================================================================
 # 環境変数の設定
@@ -52,9 +66,13 @@ RESULTS_DIR = TMP_DIR / 'results'  # 検索結果のExcelファイルの保存
 
 # ディレクトリを作成（存在しない場合）
 # parents=True: 親ディレクトリも含めて作成
-# exist_ok=True: 既に存在する場合はエラーを出さない
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+# exist_ok=Trueの代わりにFileExistsErrorを捕捉する
+# （exist_ok=Trueでは、既に存在する場合にディレクトリかどうかの確認でstatが追加で呼ばれるため）
+for tmp_dir in (UPLOAD_DIR, RESULTS_DIR):
+    try:
+        tmp_dir.mkdir(parents=True)
+    except FileExistsError:
+        pass
 
 # 環境変数で一時ディレクトリを設定
 # app.pyでこれらの環境変数を読み取って、一時ディレクトリを使用する
@@ -65,17 +83,247 @@ os.environ['RESULTS_FOLDER'] = str(RESULTS_DIR)
 # Flaskアプリケーションのインポート
 # ============================================================================
 
-# Flaskアプリをインポート
-# VercelのPython runtimeがFlaskアプリを正しく認識できるようにする
-# エラーが発生した場合は、詳細なエラー情報をログに出力してから再発生させる
-try:
-    from app import app
-except Exception as e:
-    import traceback
-    error_trace = traceback.format_exc()
-    import logging
-    logging.error(f"Error importing Flask app: {error_trace}")
-    raise
+# Flaskアプリは最初のリクエスト時に遅延インポートする
+# app.pyのインポートはFlask/openpyxlなどの重いモジュールを読み込むため、
+# モジュールのトップレベルでインポートするとhandlerの登録（コールドスタート）が遅くなる
+# 一度インポートした後は、コンテナが再利用される間キャッシュされたものを使用する
+_app = None
+
+
+def _get_app():
+    """
+    Flaskアプリケーションを取得する関数（遅延インポート）
+    
+    初回呼び出し時にapp.pyからFlaskアプリをインポートし、以降はキャッシュを返します。
+    インポート時にURLマップのコンパイルも済ませておきます。
+    エラーが発生した場合は、詳細なエラー情報をログに出力してから再発生させます。
+    
+    戻り値:
+        Flask: Flaskアプリケーションインスタンス
+    """
+    global _app
+    if _app is None:
+        try:
+            from app import app as flask_app
+        except Exception:
+            logging.error("Error importing Flask app", exc_info=True)
+            raise
+        # URLルーティングのマップを事前にコンパイルする
+        # 通常は最初のリクエストのルーティング時に行われる処理を、アプリの初期化時にまとめて済ませる
+        flask_app.url_map.update()
+        _app = flask_app
+    return _app
+
+# ============================================================================
+# ウォームアップ
+# ============================================================================
+
+# ウォームアップ用のパス
+# Vercel Cronなどから定期的に呼び出し、コールドスタートを減らす
+# （Hobbyプランのcronは1日1回までのため、既定のvercel.jsonには設定しない。README参照）
+WARMUP_PATH = '/api/_warmup'
+
+# ============================================================================
+# GETレスポンスのキャッシュ
+# ============================================================================
+
+# キャッシュ対象のGETエンドポイント（入力が同じなら同じレスポンスを返す読み取り専用のもの）
+# ヘルスチェックはFlaskアプリの稼働確認を目的とするため、キャッシュしない
+# 検索結果ファイルはタイムスタンプと一意な識別子付きのファイル名で作成され
+# （app.pyのmake_results_file_path）、上書きされないため、同じfile_pathに対するダウンロードは同じ内容になる
+CACHEABLE_GET_PATHS = frozenset(['/api/download-results'])
+
+# キャッシュするレスポンスの最大件数
+GET_CACHE_MAXSIZE = 256
+
+# キャッシュするレスポンスボディの最大サイズ（文字数）
+# 大きなExcelファイルをキャッシュするとコンテナのメモリを圧迫するため、上限を設ける
+GET_CACHE_MAX_BODY_SIZE = 1 * 1024 * 1024  # 1MB
+
+# (パス, クエリ文字列)をキーとするLRUキャッシュ
+# コンテナはリクエスト間で再利用されるため、同じコンテナ内ではキャッシュが有効
+_get_cache = OrderedDict()
+
+
+def _get_cached_response(cache_key):
+    """
+    キャッシュからレスポンスを取得する関数
+    
+    引数:
+        cache_key: キャッシュのキー（(パス, クエリ文字列)のタプル）
+    
+    戻り値:
+        dict: Vercelのレスポンス形式（キャッシュにない場合はNone）
+    """
+    cached_response = _get_cache.get(cache_key)
+    if cached_response is None:
+        return None
+    _get_cache.move_to_end(cache_key)  # 最近使用したものとして末尾に移動
+    # 呼び出し側でヘッダーが変更されてもキャッシュに影響しないようにコピーを返す
+    return dict(cached_response, headers=dict(cached_response['headers']))
+
+
+def _store_cached_response(cache_key, vercel_response):
+    """
+    レスポンスをキャッシュに保存する関数
+    
+    引数:
+        cache_key: キャッシュのキー（(パス, クエリ文字列)のタプル）
+        vercel_response: Vercelのレスポンス形式の辞書
+    """
+    if len(vercel_response['body']) > GET_CACHE_MAX_BODY_SIZE:
+        return
+    _get_cache[cache_key] = dict(vercel_response, headers=dict(vercel_response['headers']))
+    _get_cache.move_to_end(cache_key)
+    # 最大件数を超えた場合は、最も古いものから削除
+    while len(_get_cache) > GET_CACHE_MAXSIZE:
+        _get_cache.popitem(last=False)
+
+
+# ============================================================================
+# CORSヘッダー
+# ============================================================================
+
+# すべてのレスポンスに付与するCORSヘッダー（完全公開モード）
+# リクエストごとに辞書を作り直さないよう、モジュールレベルで一度だけ定義する
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',  # すべてのオリジンを許可
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',  # 許可するHTTPメソッド
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization',  # 許可するHTTPヘッダー
+}
+
+# ============================================================================
+# エラーレスポンス
+# ============================================================================
+
+# エラーレスポンスのヘッダー
+ERROR_HEADERS = {
+    'Content-Type': 'application/json',  # JSON形式のレスポンス
+    'Access-Control-Allow-Origin': '*'  # CORSヘッダー
+}
+
+
+def _error_response(error_message, error):
+    """
+    500エラーのレスポンスを構築する関数
+    
+    引数:
+        error_message: エラーメッセージ
+        error: 発生した例外（エラーの種類の取得に使用）
+    
+    戻り値:
+        dict: Vercelのレスポンス形式
+    """
+    error_data = {
+        'success': False,  # エラーが発生したことを示す
+        'error': error_message,  # エラーメッセージ
+        'error_type': type(error).__name__  # エラーの種類
+    }
+    if ORJSON_AVAILABLE:
+        # orjsonはUTF-8のまま出力するため、日本語文字もそのまま表示される
+        body = orjson.dumps(error_data).decode('utf-8')
+    else:
+        # 日本語文字を正しく表示するため、ensure_ascii=Falseを指定
+        body = json.dumps(error_data, ensure_ascii=False)
+    return {
+        'statusCode': 500,  # 内部サーバーエラー
+        'headers': dict(ERROR_HEADERS),
+        'body': body
+    }
+
+
+# ============================================================================
+# レスポンスのMIMEタイプ判定
+# ============================================================================
+
+# テキストとして返すMIMEタイプ（text/*以外）
+# これ以外のMIMEタイプ（Excelファイルなど）はbase64エンコードして返す
+TEXT_MIMETYPES = frozenset([
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/x-www-form-urlencoded',
+])
+
+
+def _is_text_mimetype(mimetype):
+    """
+    MIMEタイプがテキスト形式かどうかを判定する関数
+    
+    引数:
+        mimetype: MIMEタイプ（例: 'application/json'）
+    
+    戻り値:
+        bool: テキスト形式の場合はTrue
+    """
+    if not mimetype:
+        return False
+    return (
+        mimetype.startswith('text/')
+        or mimetype in TEXT_MIMETYPES
+        or mimetype.endswith('+json')
+        or mimetype.endswith('+xml')
+    )
+
+
+# ============================================================================
+# WSGI environの構築
+# ============================================================================
+
+# WSGI environのテンプレート（リクエストごとに変わらない項目）
+# コンテナはリクエスト間で再利用されるため、モジュールレベルで一度だけ構築する
+ENVIRON_BASE = {
+    'SCRIPT_NAME': '',
+    'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '443',
+    'SERVER_PROTOCOL': 'HTTP/1.1',
+    'wsgi.version': (1, 0),
+    'wsgi.url_scheme': 'https',
+    'wsgi.errors': sys.stderr,
+    'wsgi.multithread': False,
+    'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+}
+
+
+def _build_environ(method, path, query_string, headers, body_bytes):
+    """
+    VercelのリクエストからWSGI environ辞書を構築する関数
+    
+    引数:
+        method: HTTPメソッド
+        path: リクエストパス（正規化済み、例: /api/search）
+        query_string: クエリ文字列（key=value&...形式）
+        headers: HTTPヘッダー（辞書形式）
+        body_bytes: リクエストボディ（バイト形式）
+    
+    戻り値:
+        dict: WSGI environ辞書
+    """
+    # リクエストごとに変わらない項目はテンプレートをコピーして使用する
+    environ = ENVIRON_BASE.copy()
+    environ['REQUEST_METHOD'] = method.upper()
+    # WSGIではパスをlatin-1文字列として渡す必要がある（日本語パス対応）
+    environ['PATH_INFO'] = path.encode('utf-8').decode('latin-1')
+    environ['QUERY_STRING'] = query_string
+    environ['wsgi.input'] = io.BytesIO(body_bytes)  # リクエストボディ
+    
+    # HTTPヘッダーをenvironに変換（例: content-type -> CONTENT_TYPE, x-foo -> HTTP_X_FOO）
+    if isinstance(headers, dict):
+        for key, value in headers.items():
+            name = key.upper().replace('-', '_')
+            if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[name] = value
+            else:
+                environ['HTTP_' + name] = value
+    
+    # ボディはデコード済みのため、Content-Lengthは実際のバイト数を使用する
+    environ['CONTENT_LENGTH'] = str(len(body_bytes))
+    if 'HTTP_HOST' in environ:
+        environ['SERVER_NAME'] = environ['HTTP_HOST'].split(':')[0]
+    
+    return environ
+
 
 # ============================================================================
 # Vercel Serverless Function Handler
@@ -96,22 +344,25 @@ def handler(request):
             - queryStringParameters: クエリパラメータ（辞書形式）
             - headers: HTTPヘッダー（辞書形式）
             - body: リクエストボディ（文字列またはバイト）
+            - isBase64Encoded: ボディがbase64エンコードされているか（真偽値）
     
     戻り値:
         dict: Vercelのレスポンス形式
             - statusCode: HTTPステータスコード（例: 200, 404, 500）
             - headers: HTTPレスポンスヘッダー（辞書形式）
             - body: レスポンスボディ（文字列）
+            - isBase64Encoded: ボディがbase64エンコードされているか（真偽値）
     
     処理の流れ:
         1. リクエスト情報を取得（メソッド、パス、クエリパラメータ、ヘッダー、ボディ）
-        2. パスから/api/プレフィックスを削除（Flaskアプリのルーティングに合わせる）
-        3. クエリ文字列を構築
-        4. ボディをバイト形式に変換
-        5. Flaskのtest_request_contextを使用してリクエストを実行
-        6. レスポンスを取得して、Vercelの形式に変換
-        7. CORSヘッダーを追加（完全公開モード）
-        8. エラーが発生した場合は、エラー情報を含むレスポンスを返す
+        2. OPTIONSリクエスト（CORSプリフライト）の場合は、CORSヘッダーのみを返す
+        3. パスを正規化（Flaskアプリのルーティングに合わせる）
+        4. クエリ文字列を構築
+        5. ボディをバイト形式に変換
+        6. WSGI environを構築して、Flaskアプリケーションを直接実行
+        7. レスポンスを取得して、Vercelの形式に変換
+        8. CORSヘッダーを追加（完全公開モード）
+        9. エラーが発生した場合は、エラー情報を含むレスポンスを返す
     """
     try:
         # ====================================================================
@@ -128,6 +379,7 @@ def handler(request):
             query_string = request.get('queryStringParameters', {}) or {}  # クエリパラメータ
             headers = request.get('headers', {}) or {}  # HTTPヘッダー
             body = request.get('body', '')  # リクエストボディ
+            is_base64_encoded = request.get('isBase64Encoded', False)  # ボディがbase64エンコードされているか
         else:
             # オブジェクト形式のリクエスト
             method = getattr(request, 'method', 'GET')
@@ -135,93 +387,99 @@ def handler(request):
             query_string = getattr(request, 'queryStringParameters', {}) or {}
             headers = getattr(request, 'headers', {}) or {}
             body = getattr(request, 'body', '')
+            is_base64_encoded = getattr(request, 'isBase64Encoded', False)
+        
+        # ====================================================================
+        # CORSプリフライトリクエストの処理
+        # ====================================================================
+        
+        # OPTIONSリクエスト（CORSプリフライト）はCORSヘッダーを返すだけなので、
+        # Flaskのルーティングを通さずにここで直接レスポンスを返す
+        if method == 'OPTIONS':
+            return {
+                'statusCode': 204,  # No Content
+                'headers': dict(CORS_HEADERS),
+                'body': ''
+            }
         
         # ====================================================================
         # パスの処理
         # ====================================================================
         
-        # パスから/api/プレフィックスを削除
+        # パスを正規化
         # Vercelのrewrites設定により、/api/*のリクエストが/api/index.pyにルーティングされる
-        # しかし、Flaskアプリのルーティングでは/api/プレフィックスは不要
-        # そのため、/api/プレフィックスを削除してFlaskアプリに渡す
-        if path.startswith('/api/'):
-            path = path[4:]  # '/api/'を削除（例: /api/search -> /search）
-        elif path.startswith('api/'):
-            path = path[4:]  # 'api/'を削除（例: api/search -> /search）
+        # Flaskアプリのルーティングは/api/プレフィックス付き（例: /api/search）で定義されているため、
+        # プレフィックスは削除せず、先頭のスラッシュのみを補う（例: api/search -> /api/search、空文字列 -> /）
+        if not path.startswith('/'):
+            path = '/' + path
         
-        # パスが空の場合はルートに設定
-        # パスが空文字列の場合は、ルートパス（/）に設定
-        if not path or path == '':
-            path = '/'
+        # ウォームアップリクエスト（Vercel Cronなどから定期的に呼び出される）
+        # コンテナを起動状態に保つことが目的なので、Flaskアプリを通さずに即座に返す
+        # 他のレスポンスと同様にCORSヘッダーを付ける
+        if path == WARMUP_PATH:
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'text/plain', **CORS_HEADERS},
+                'body': 'ok'
+            }
         
         # ====================================================================
         # クエリ文字列の構築
         # ====================================================================
         
         # クエリ文字列を構築
-        # クエリパラメータをkey=value形式の文字列に変換
-        query_parts = []
-        if query_string:
-            for key, value in query_string.items():
-                if value:  # 値が存在する場合のみ追加
-                    query_parts.append(f"{key}={value}")
-        query_string_str = '&'.join(query_parts)  # クエリパラメータを&で結合
+        # クエリパラメータをkey=value形式の文字列に変換（値が存在する場合のみ）
+        # urlencodeで値をURLエンコードするため、&や=、日本語を含む値も正しく渡せる
+        # doseq=True: 値がリストの場合は、同じキーを繰り返して展開する
+        query_string_str = urlencode(
+            {key: value for key, value in query_string.items() if value},
+            doseq=True
+        )
+        
+        # 読み取り専用のGETリクエストは、キャッシュに同じレスポンスがあればそれを返す
+        cache_key = None
+        if method == 'GET' and path in CACHEABLE_GET_PATHS:
+            cache_key = (path, query_string_str)
+            cached_response = _get_cached_response(cache_key)
+            if cached_response is not None:
+                return cached_response
         
         # ====================================================================
         # リクエストボディの処理
         # ====================================================================
         
         # ボディをバイトに変換
-        # Flaskのtest_request_contextはバイト形式のボディを期待する
+        # WSGIの入力ストリームはバイト形式のボディを期待する
         # VercelのServerless Functionsでは、リクエストボディは文字列またはbase64エンコードされた文字列として渡される可能性がある
         if isinstance(body, str):
-            # base64エンコードされている可能性をチェック
-            try:
-                import base64
-                # base64デコードを試みる（失敗した場合は通常の文字列として扱う）
-                body_bytes = base64.b64decode(body)
-            except:
+            # isBase64Encodedフラグでbase64エンコードされているかを判定
+            # （フラグなしでデコードを試みると、通常のボディでも全体を走査して例外が発生するため）
+            if is_base64_encoded:
+                body_bytes = base64.b64decode(body, validate=False)  # base64デコード
+            else:
                 body_bytes = body.encode('utf-8')  # 文字列をUTF-8エンコード
         elif body is None:
             body_bytes = b''  # Noneの場合は空のバイト列
         else:
             body_bytes = body  # 既にバイト形式の場合はそのまま使用
         
-        # ====================================================================
-        # Content-Typeヘッダーの確認
-        # ====================================================================
-        
-        # Content-Typeヘッダーを確認
-        # multipart/form-dataの場合は、Flaskがファイルアップロードを処理できるようにする
-        content_type = headers.get('content-type', '').lower() if isinstance(headers, dict) else ''
-        
-        # multipart/form-dataの場合は、リクエストオブジェクトから直接取得
-        # VercelのServerless Functionsでは、multipart/form-dataは特殊な形式で渡される
-        # しかし、Flaskのtest_request_contextでは、通常の形式で処理できる
-        request_data = body_bytes
-        request_content_type = content_type
-        
         # ====================================================================
         # Flaskアプリケーションの実行
         # ====================================================================
         
-        # Flaskのテストクライアントを使用
-        # test_request_contextを使用して、Flaskアプリケーションを実行する
-        # これにより、実際のHTTPリクエストをシミュレートできる
-        # 注意: multipart/form-dataの場合は、Vercelが既にパースしている可能性があるため、
-        # リクエストオブジェクトから直接取得する必要がある場合がある
+        # WSGI environを直接構築して、Flaskアプリケーションを実行する
+        # test_request_contextはEnvironBuilderでボディを再構築するため、
+        # 大きなmultipart/form-data（Excelアップロード）ではメモリと処理時間を余分に消費する
+        # environの'wsgi.input'にボディをそのまま渡すことで、Werkzeugが
+        # ストリームから直接multipartをパースできる（大きなファイルは一時ファイルに書き出される）
+        environ = {}  # エラーログ出力時にも参照するため、tryの外で初期化
         try:
-            with app.test_request_context(
-                path=path,  # リクエストパス
-                method=method,  # HTTPメソッド
-                query_string=query_string_str,  # クエリ文字列
-                headers=headers,  # HTTPヘッダー
-                data=request_data,  # リクエストボディ
-                content_type=request_content_type if request_content_type else None  # Content-Type
-            ):
+            app = _get_app()
+            environ = _build_environ(method, path, query_string_str, headers, body_bytes)
+            
             # Flaskアプリケーションを実行してレスポンスを取得
-            # full_dispatch_response()は、リクエストを処理してレスポンスを返す
-            response = app.full_dispatch_response()
+            # from_app()は、WSGIアプリケーションを呼び出してレスポンスオブジェクトを返す
+            response = app.response_class.from_app(app.wsgi_app, environ, buffered=True)
             
             # ================================================================
             # レスポンスヘッダーの構築
@@ -229,15 +487,11 @@ def handler(request):
             
             # レスポンスヘッダーを構築
             # Flaskのレスポンスヘッダーを辞書形式に変換
-            response_headers = {}
-            for key, value in response.headers:
-                response_headers[key] = value
+            response_headers = dict(response.headers)
             
             # CORSヘッダーを追加（完全公開モード）
             # これにより、すべてのオリジンからのリクエストを許可する
-            response_headers['Access-Control-Allow-Origin'] = '*'  # すべてのオリジンを許可
-            response_headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'  # 許可するHTTPメソッド
-            response_headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'  # 許可するHTTPヘッダー
+            response_headers.update(CORS_HEADERS)
             
             # ================================================================
             # レスポンスボディの処理
@@ -246,24 +500,21 @@ def handler(request):
             # レスポンスボディを取得
             # as_text=Falseでバイト形式で取得（バイナリデータに対応）
             response_body = response.get_data(as_text=False)
-            if response_body:
-                try:
-                    # バイナリデータの場合はbase64エンコード
-                    if isinstance(response_body, bytes):
-                        # JSONレスポンスの場合は文字列として返す
-                        try:
-                            response_body_str = response_body.decode('utf-8')  # UTF-8でデコード
-                        except UnicodeDecodeError:
-                            # バイナリデータ（画像、Excelファイルなど）の場合はbase64エンコード
-                            import base64
-                            response_body_str = base64.b64encode(response_body).decode('utf-8')
-                            response_headers['Content-Encoding'] = 'base64'  # base64エンコードであることを示す
-                    else:
-                        response_body_str = str(response_body)  # 文字列形式の場合はそのまま使用
-                except:
-                    response_body_str = str(response_body)  # エラーが発生した場合は文字列に変換
-            else:
+            is_base64_encoded = False  # レスポンスボディをbase64エンコードしたかどうか
+            if not response_body:
                 response_body_str = ''  # ボディが空の場合は空文字列
+            elif _is_text_mimetype(response.mimetype):
+                # テキスト形式（JSONなど）の場合は文字列として返す
+                response_body_str = response_body.decode(response.mimetype_params.get('charset', 'utf-8'), errors='replace')
+            else:
+                # バイナリデータ（Excelファイル、画像など）の場合はbase64エンコード
+                # UTF-8デコードを試みずに直接エンコードすることで、大きなファイルの無駄な走査を避ける
+                # binascii.b2a_base64はbase64モジュールのラッパーを経由しない分だけ高速
+                response_body_str = binascii.b2a_base64(response_body, newline=False).decode('ascii')
+                # base64エンコードであることはisBase64Encodedフラグで示す
+                # （Content-Encoding: base64は標準のヘッダー値ではなく、クライアントが正しく扱えないため使用しない）
+                # Vercelがエッジでデコードし、クライアントには元のバイナリが送信される
+                is_base64_encoded = True
             
             # ================================================================
             # Vercelのレスポンス形式で返す
@@ -271,60 +522,39 @@ def handler(request):
             
             # VercelのResponse形式で返す
             # VercelのServerless Functionsは、この形式の辞書を期待する
-            return {
+            vercel_response = {
                 'statusCode': response.status_code,  # HTTPステータスコード（200, 404, 500など）
                 'headers': response_headers,  # HTTPレスポンスヘッダー
-                'body': response_body_str  # レスポンスボディ（文字列形式）
+                'body': response_body_str,  # レスポンスボディ（文字列形式）
+                'isBase64Encoded': is_base64_encoded  # ボディがbase64エンコードされているか
             }
-        except Exception as context_error:
-            # test_request_context内でエラーが発生した場合
-            import traceback
-            error_trace = traceback.format_exc()
-            import logging
-            logging.error(f"Error in Flask request context: {error_trace}")
-            logging.error(f"Path: {path}, Method: {method}, Content-Type: {content_type}")
+            
+            # 読み取り専用のGETリクエストの成功レスポンスはキャッシュに保存する
+            if cache_key is not None and response.status_code == 200:
+                _store_cached_response(cache_key, vercel_response)
+            
+            return vercel_response
+        except Exception as dispatch_error:
+            # Flaskアプリケーションの実行中にエラーが発生した場合
+            # exc_info=Trueを指定すると、スタックトレースの整形はログ出力時にのみ行われる
+            logging.error("Error in Flask WSGI dispatch", exc_info=True)
+            # Content-Typeはenviron構築時に取り出したものを使用する（ヘッダー名の大文字小文字を問わない）
+            logging.error(f"Path: {path}, Method: {method}, Content-Type: {environ.get('CONTENT_TYPE', '')}")
             
             # エラーレスポンスを返す
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': f'Flask request context error: {str(context_error)}',
-                    'error_type': type(context_error).__name__,
-                    'traceback': error_trace
-                }, ensure_ascii=False)
-            }
+            return _error_response(f'Flask dispatch error: {str(dispatch_error)}', dispatch_error)
             
     except Exception as e:
         # ====================================================================
         # エラーハンドリング
         # ====================================================================
         
-        import traceback
-        error_trace = traceback.format_exc()
-        
         # エラーをログに出力（Vercelのログで確認可能）
         # Vercelダッシュボードの「Runtime Logs」で確認できる
-        import logging
-        logging.error(f"Error in handler: {error_trace}")
+        # スタックトレースはログにのみ出力し、レスポンスには含めない（内部情報の漏えい防止）
+        logging.error("Error in handler", exc_info=True)
         logging.error(f"Request: {request}")
         
         # エラーレスポンスを返す
         # エラーが発生した場合でも、適切な形式でレスポンスを返す
-        return {
-            'statusCode': 500,  # 内部サーバーエラー
-            'headers': {
-                'Content-Type': 'application/json',  # JSON形式のレスポンス
-                'Access-Control-Allow-Origin': '*'  # CORSヘッダー
-            },
-            'body': json.dumps({
-                'success': False,  # エラーが発生したことを示す
-                'error': str(e),  # エラーメッセージ
-                'error_type': type(e).__name__,  # エラーの種類
-                'traceback': error_trace  # スタックトレース（デバッグ用）
-            }, ensure_ascii=False)  # 日本語文字を正しく表示するため、ensure_ascii=Falseを指定
-        }
+        return _error_response(str(e), e)
@@ -15,23 +15,45 @@ Excelファイル検索・抽出アプリケーション
 技術スタック:
 - Flask: Webフレームワーク
 - openpyxl: Excelファイルの読み書き
-- pandas: データ処理（必要に応じて）
+- pandas: データ処理（必要に応じて関数内でインポートする）
 - flask-cors: CORS対応
 """
 import os  # オペレーティングシステム関連の機能
 import json  # JSONデータの処理
 import re  # 正規表現処理
+try:
+    from re import _parser as sre_parse  # 正規表現の構文解析（Python 3.11以降）
+except ImportError:
+    import sre_parse  # 正規表現の構文解析（Python 3.10以前）
 import shutil  # ファイル操作（コピーなど）
 import subprocess  # 外部プロセスの実行
 import platform  # プラットフォーム情報の取得
+import logging  # ログ出力
+import sqlite3  # セルの値のインデックス（検索の高速化）
+import hashlib  # インデックスのキー（ファイル内容のハッシュ値）の計算
+import time  # インデックスの最終使用日時の記録
+import tempfile  # アップロードされたファイルの一時保存
+import threading  # 結果ブックのバックグラウンド書き出しの排他制御
+import multiprocessing  # 並列処理のプロセスの起動方法の指定
+import functools  # セル詳細表示用のシートのキャッシュ
+import zipfile  # .xlsxファイル（ZIP形式）の共有文字列の事前確認
+import html  # 共有文字列のXMLの文字参照の変換
+import uuid  # 検索結果ファイル名の一意な識別子
 from pathlib import Path  # パス操作のためのクラス
-from flask import Flask, request, jsonify, send_file  # Flask関連のインポート
+from flask import Flask, Request, request, jsonify, send_file  # Flask関連のインポート
+from flask.json.provider import DefaultJSONProvider  # JSONレスポンスの作成方法のカスタマイズ
+from werkzeug.utils import secure_filename  # アップロードされたファイル名の安全な変換
 from flask_cors import CORS  # CORS（Cross-Origin Resource Sharing）対応
 import openpyxl  # Excelファイルの読み書きライブラリ
 from openpyxl import Workbook  # Excelワークブックの作成
+from openpyxl.cell import WriteOnlyCell  # 書き込み専用モードのセル
+from openpyxl.utils import get_column_letter  # 列番号から列文字（A, B, C...）への変換
 from openpyxl.styles import Font, PatternFill, Alignment  # Excelのスタイル設定
-import pandas as pd  # データ分析ライブラリ（必要に応じて使用）
-from datetime import datetime  # 日時処理
+from datetime import datetime, date, time as datetime_time, timedelta  # 日時処理
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor  # 複数ファイルの並列処理
+from concurrent.futures.process import BrokenProcessPool  # ワーカープロセスの異常終了
+from itertools import repeat, islice  # 並列処理の引数の繰り返し、マッチの先頭からの取り出し
+from collections import namedtuple  # 検索結果のレコード
 
 # ============================================================================
 # オプションライブラリのインポート
@@ -53,6 +75,42 @@ except ImportError:
         # Vercel環境ではprint文が問題を引き起こす可能性があるため、ログ出力は後で行う
         # 警告は後でapp.loggerを使用して出力する
 
+# Aho-Corasick法による複数キーワードの同時検索ライブラリ（オプション）
+# 複数のキーワードをセルの値の1回の走査でまとめて検索できる
+# 利用できない場合はキーワードごとの部分文字列検索を使用
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Rustで実装された高速なExcelリーダー（オプション）
+# 検索時のセルの値の読み込みに使用する（openpyxlより高速で、メモリ使用量も少ない）
+# 利用できない場合はopenpyxlの読み取り専用モードを使用
+try:
+    from python_calamine import CalamineWorkbook, SheetTypeEnum
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+# lxml（オプション）
+# openpyxlはlxmlがインストールされている場合、XMLの解析・書き出しにlxmlを使用する
+# 標準ライブラリのElementTreeより高速で、検索結果ブックの書き出し（書き込み専用モード）も速くなる
+# 利用できない場合は標準ライブラリのElementTreeが使用される（動作は同じ）
+try:
+    from openpyxl.xml import LXML as LXML_AVAILABLE
+except ImportError:
+    LXML_AVAILABLE = False
+
+# 高速なJSONシリアライザ（オプション）
+# 検索結果が多い場合に、JSONレスポンスの作成を高速化する
+# 利用できない場合は標準のjsonモジュールを使用
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Windows環境でExcelを操作するためのライブラリ（オプション）
 # win32comを使用すると、Excelアプリケーションを直接操作できる
 # 利用できない環境（Linux/Mac）でも動作するようにオプションとして扱う
@@ -69,15 +127,47 @@ except ImportError:
 # Flaskアプリケーションインスタンスの作成
 app = Flask(__name__)
 
+# orjsonが利用できる場合は、jsonifyでのJSONレスポンスの作成にorjsonを使用
+# orjsonはCで実装されており、検索結果（数万件の辞書のリスト）も標準のjsonモジュールより高速に変換できる
+if ORJSON_AVAILABLE:
+    class OrjsonProvider(DefaultJSONProvider):
+        """
+        orjsonを使用してJSONに変換するJSONプロバイダー
+        
+        jsonify()はapp.jsonのresponse()を呼び出すため、各エンドポイントを変更せずにorjsonを使用できます。
+        
+        注意:
+            - 日本語などの文字は\\uXXXXにエスケープせず、UTF-8のまま出力します
+            - キーの並べ替えは行いません（変換を速くするため）
+            - orjsonが変換できない型（Decimalなど）は、Flaskの標準の変換方法（default）で変換します
+        """
+        # 辞書のキーが文字列以外（数値など）の場合も、標準のjsonモジュールと同じく文字列に変換する
+        option = orjson.OPT_NON_STR_KEYS
+        
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=self.default, option=self.option).decode('utf-8')
+        
+        def response(self, *args, **kwargs):
+            # バイト列のままレスポンスにして、文字列への変換を省く
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(
+                orjson.dumps(obj, default=self.default, option=self.option), mimetype=self.mimetype
+            )
+    
+    app.json = OrjsonProvider(app)
+
 # CORS（Cross-Origin Resource Sharing）を有効化
 # これにより、異なるドメインからのリクエストを許可する（完全公開モード）
 CORS(app)
 
 # Hyperlinkが利用できない場合の警告をログに出力
 if not HYPERLINK_AVAILABLE:
-    import logging
     logging.warning("Hyperlink class not available, will use string hyperlinks")
 
+# lxmlが利用できない場合の警告をログに出力（Excelファイルの読み書きが遅くなるため）
+if not LXML_AVAILABLE:
+    logging.warning("lxml not available, openpyxl will use the slower ElementTree XML backend")
+
 # ファイルアップロードサイズ制限を設定
 # デフォルトは16MBだが、大きなExcelファイルに対応するため100MBに拡大
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB
@@ -90,23 +180,47 @@ app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB
 # app.pyがあるディレクトリをベースディレクトリとして使用
 BASE_DIR = Path(__file__).parent.resolve()
 
+# 実行環境（プロセスの実行中は変わらないため、起動時に一度だけ判定する）
+# Vercel環境かどうか（api/index.pyのハンドラーは、このモジュールを読み込む前にVERCELを設定する）
+IS_VERCEL = bool(os.environ.get('VERCEL'))
+
+# 実行中のプラットフォーム（ハイパーリンクの形式やファイルを開く方法の判定に使用）
+# platform.system()は結果ごとに呼び出すとコストがかかるため、起動時に一度だけ判定する
+IS_WINDOWS = platform.system() == 'Windows'
+IS_MACOS = platform.system() == 'Darwin'
+
+# フォルダ選択で、ダイアログを開かずに使用するフォルダ（環境変数で設定、空の場合は使用しない）
+DEFAULT_SEARCH_FOLDER = os.environ.get('DEFAULT_SEARCH_FOLDER', '')
+
 # アップロードファイルと結果ファイルの保存先を設定
 # Vercel環境の場合は/tmpディレクトリを使用（Serverless Functionsの制約）
 # ローカル環境の場合は、アプリケーションディレクトリ内に作成
-if os.environ.get('VERCEL'):
+if IS_VERCEL:
     # Vercel環境: Serverless Functionsでは/tmpディレクトリのみ書き込み可能
     TMP_BASE = Path('/tmp')
     UPLOAD_FOLDER = TMP_BASE / 'uploads'  # アップロードされたファイルの一時保存先
     RESULTS_FOLDER = TMP_BASE / 'results'  # 検索結果のExcelファイルの保存先
+    CELL_INDEX_PATH = TMP_BASE / 'cell_index.sqlite3'  # セルの値のインデックス
 else:
     # ローカル環境: アプリケーションディレクトリ内にフォルダを作成
     UPLOAD_FOLDER = BASE_DIR / 'uploads'  # アップロードされたファイルの保存先
     RESULTS_FOLDER = BASE_DIR / 'results'  # 検索結果のExcelファイルの保存先
+    CELL_INDEX_PATH = BASE_DIR / 'cell_index.sqlite3'  # セルの値のインデックス
 
 # 環境変数で上書き可能（デプロイ環境などで設定）
 # これにより、異なる環境で異なる保存先を指定できる
 UPLOAD_FOLDER = Path(os.environ.get('UPLOAD_FOLDER', str(UPLOAD_FOLDER)))
 RESULTS_FOLDER = Path(os.environ.get('RESULTS_FOLDER', str(RESULTS_FOLDER)))
+CELL_INDEX_PATH = Path(os.environ.get('CELL_INDEX_PATH', str(CELL_INDEX_PATH)))
+
+# セルの値のインデックスを使用するかどうか（CELL_INDEX=1 で有効化、既定は無効）
+# 同じファイルを繰り返し検索する場合に、2回目以降はExcelファイルの解析を省略する
+# 注意: 初回の検索はインデックスの作成のため直接検索より遅く、セルの値をすべてCELL_INDEX_PATHに保存する
+#       （アップロードされたファイルはインデックスに保存しない）
+CELL_INDEX_ENABLED = os.environ.get('CELL_INDEX', '0').lower() in ('true', '1', 'yes')
+
+# インデックスに保持するファイル数の上限（超えた場合は最後に使用した日時が古いものから削除）
+CELL_INDEX_MAX_FILES = int(os.environ.get('CELL_INDEX_MAX_FILES', '200'))
 
 # ディレクトリが存在しない場合は作成
 # parents=True: 親ディレクトリも含めて作成
@@ -115,432 +229,2131 @@ UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
 RESULTS_FOLDER.mkdir(parents=True, exist_ok=True)
 
 
-def search_keywords_in_excel(file_path, keywords):
+# ============================================================================
+# アップロードファイルの受信
+# ============================================================================
+
+class UploadRequest(Request):
     """
-    Excelファイル内でキーワードを検索する関数
+    アップロードされたファイルをUPLOAD_FOLDERに直接書き込むリクエストクラス
     
-    指定されたExcelファイルの全シートを走査し、各セルの値をチェックして
-    キーワードが含まれているかどうかを判定します。
-    大文字小文字を区別しない検索を行います。
+    Flask（Werkzeug）の標準のリクエストでは、アップロードされたファイルを一時ファイル
+    （またはメモリ）に受信し、さらにFileStorage.saveでUPLOAD_FOLDERにコピーするため、
+    大きなファイルでは書き込みが2回発生します。このクラスでは、受信時にUPLOAD_FOLDERの
+    ファイルへ直接書き込むため、FileStorage.streamのファイルをそのまま検索に使用できます。
+    
+    注意:
+        - 受信したファイルは、リクエストの終了時（close）に削除されます
+        - ファイルの拡張子は元のファイル名の拡張子を引き継ぎます
+          （openpyxlなどは拡張子でファイル形式を判定するため）
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # 元のファイル名から拡張子のみを取得（ファイル名自体は使用しない）
+        suffix = Path(secure_filename(filename or '')).suffix.lower()
+        stream = tempfile.NamedTemporaryFile(
+            mode='wb+', dir=str(UPLOAD_FOLDER), prefix='upload_', suffix=suffix, delete=False
+        )
+        # リクエストの終了時に削除するファイルとして記録
+        if not hasattr(self, '_uploaded_file_paths'):
+            self._uploaded_file_paths = []
+        self._uploaded_file_paths.append(stream.name)
+        return stream
+    
+    def close(self):
+        # アップロードされたファイルのストリームを閉じてから、受信したファイルを削除
+        super().close()
+        for uploaded_file_path in getattr(self, '_uploaded_file_paths', ()):
+            try:
+                os.remove(uploaded_file_path)
+            except FileNotFoundError:
+                pass  # 既に削除されている場合
+            except OSError as e:
+                app.logger.warning(f"Error deleting uploaded file {uploaded_file_path}: {str(e)}")
+
+
+# アップロードを受信するリクエストクラスを設定
+app.request_class = UploadRequest
+
+
+# 検索結果のレコード（1つのセルで1つのキーワードがマッチしたことを表す）
+# マッチ数が多い場合でもメモリ使用量やプロセス間の受け渡しのコストを抑えるため、辞書ではなくnamedtupleを使用
+#   sheet: シート名
+#   row: 行番号（1から始まる）
+#   col: 列番号（1から始まる）
+#   value: セルの値（文字列）
+#   keyword: マッチしたキーワード
+#   file: ファイルパス
+# JSONで返す場合は_asdict()で辞書に変換する
+CellMatch = namedtuple('CellMatch', ['sheet', 'row', 'col', 'value', 'keyword', 'file'])
+
+# 数値・真偽値・日時のセルの値を文字列に変換したときに現れる文字（小文字）
+# 例: '12345', '-1.5e-05', 'inf', 'nan', 'true', 'false', '2024-01-02 03:04:00+09:00',
+#     '1 day, 6:00:00'（経過時間の表示形式のセルはtimedeltaとして読み込まれる）
+NON_STRING_VALUE_CHARS = frozenset('0123456789.-+: einfatrulsdy,')
+
+# 上記の文字だけで文字列表現が構成されるセルの値の型（boolはintのサブクラス）
+NON_STRING_VALUE_TYPES = (int, float, datetime, date, datetime_time, timedelta)
+
+
+def keywords_can_match_non_string(keywords):
+    """
+    数値・真偽値・日時のセルにマッチする可能性のあるキーワードがあるかを判定する関数
+    
+    キーワードに数字や記号以外の文字（日本語など）が含まれている場合、
+    数値や日時のセルの文字列表現には絶対にマッチしないため、
+    それらのセルは文字列に変換せずにスキップできます。
     
     引数:
-        file_path: 検索対象のExcelファイルのパス（Pathオブジェクトまたは文字列）
-        keywords: 検索するキーワードのリスト（例: ['キーワード1', 'キーワード2']）
+        keywords: 検索するキーワードのリスト
+    
+    戻り値:
+        bool: マッチする可能性のあるキーワードが1つでもある場合はTrue
+    """
+    return any(set(keyword.casefold()) <= NON_STRING_VALUE_CHARS for keyword in keywords)
+
+
+def build_keyword_matcher(keywords, first_match_only=False):
+    """
+    キーワード照合関数を作成する関数
+    
+    キーワードの大文字小文字の統一（casefold）や検索用のオートマトンの構築を事前に1回だけ行い、
+    セルごとの照合ではcasefold済みのセルの値を渡すだけで済むようにします。
+    casefoldはlowerより厳密な大文字小文字の統一で、ドイツ語のßなども正しく比較できます。
+    pyahocorasickが利用できる場合は、Aho-Corasick法で全キーワードを
+    セルの値の1回の走査でまとめて検索します。利用できない場合は、全キーワードを
+    まとめた正規表現で、いずれかのキーワードを含むセルを1回の走査で絞り込みます。
+    
+    引数:
+        keywords: 検索するキーワードのリスト
+        first_match_only: Trueの場合は、マッチしたキーワードのうち最初の1つ（keywordsの順序）だけを返す
     
     戻り値:
-        list: 検索結果のリスト。各要素は以下のキーを持つ辞書:
-            - 'sheet': シート名
-            - 'row': 行番号（1から始まる）
-            - 'col': 列番号（1から始まる）
-            - 'value': セルの値（文字列）
-            - 'keyword': マッチしたキーワード
-            - 'file': ファイルパス
+        function: casefold済みのセルの値を受け取り、マッチしたキーワードのリストを
+                  keywordsの順序で返す関数
     
-    処理の流れ:
-        1. Excelファイルを開く（data_only=Trueで計算式の結果を取得）
-        2. 各シートを順に処理
-        3. 各セルを走査し、値がNoneでない場合のみ処理
-        4. セルの値を文字列に変換し、各キーワードと比較（大文字小文字を区別しない）
-        5. マッチした場合は結果リストに追加
+    注意:
+        - 1つのセルに複数のキーワードが含まれる場合は、すべてのキーワードを返します
+          （検索結果はキーワードごとに記録され、キーワードごとに色分けされるため）
+        - first_match_onlyがTrueの場合は、1つのセルにつき最大1つのキーワードを返します
+          （セルにいずれかのキーワードが含まれるかだけを知りたい場合に使用）
+        - 返されるリストは呼び出し側で変更しないでください（使い回される場合があります）
     """
-    results = []
+    # キーワードのcasefoldは事前に1回だけ行う
+    keywords_folded = [(keyword, keyword.casefold()) for keyword in keywords]
+    
+    # キーワードが1つの場合は、オートマトンを使わずに文字列の検索（in）だけで判定する
+    # マッチしないセルでは空のリストを、マッチしたセルでは同じリストを返して割り当てを省く
+    if len(keywords_folded) == 1:
+        single_keyword_folded = keywords_folded[0][1]
+        single_match = [keywords_folded[0][0]]
+        no_match = []
+        
+        def match_keywords(value_folded):
+            return single_match if single_keyword_folded in value_folded else no_match
+        
+        return match_keywords
+    
+    # 空文字列のキーワードはオートマトンに登録できないため、その場合は通常の検索を使用
+    if AHOCORASICK_AVAILABLE and all(keyword_folded for _, keyword_folded in keywords_folded):
+        automaton = ahocorasick.Automaton()
+        for keyword_index, (_, keyword_folded) in enumerate(keywords_folded):
+            # 同じキーワードが複数回指定された場合は、最初の位置を記録する
+            if not automaton.exists(keyword_folded):
+                automaton.add_word(keyword_folded, (keyword_index, keyword_folded))
+        automaton.make_automaton()
+        
+        if first_match_only:
+            def match_keywords(value_folded):
+                # セルの値を1回走査して、含まれているキーワードのうち指定順で最初のものを取得
+                # 最初のキーワードが見つかった時点で、それ以上の走査は不要
+                first_index = None
+                for _, (keyword_index, _) in automaton.iter(value_folded):
+                    if first_index is None or keyword_index < first_index:
+                        first_index = keyword_index
+                        if first_index == 0:
+                            break
+                if first_index is None:
+                    return []
+                return [keywords_folded[first_index][0]]
+            
+            return match_keywords
+        
+        def match_keywords(value_folded):
+            # セルの値を1回走査して、含まれているキーワードを取得
+            found = {keyword_folded for _, (_, keyword_folded) in automaton.iter(value_folded)}
+            if not found:
+                return []
+            # 結果はキーワードの指定順に並べる（同じセルで複数のキーワードがマッチした場合）
+            return [keyword for keyword, keyword_folded in keywords_folded if keyword_folded in found]
+    else:
+        # pyahocorasickが利用できない場合は、全キーワードを1つの正規表現（選択 |）にまとめて事前にコンパイルし、
+        # セルの値を1回走査していずれかのキーワードを含むかを判定する（大半のセルはここで除外される）
+        # マッチしたセルだけ、キーワードごとに文字列の検索（in）ですべてのキーワードを判定する
+        # （正規表現の走査では重なり合うキーワード（例: foo と foobar）をすべて取得できないため）
+        combined_pattern = re.compile('|'.join(re.escape(keyword_folded) for _, keyword_folded in keywords_folded))
+        
+        def match_keywords(value_folded):
+            if combined_pattern.search(value_folded) is None:
+                return []
+            if first_match_only:
+                # 最初にマッチしたキーワードが見つかった時点で、残りのキーワードの判定を省く
+                for keyword, keyword_folded in keywords_folded:
+                    if keyword_folded in value_folded:
+                        return [keyword]
+            return [keyword for keyword, keyword_folded in keywords_folded if keyword_folded in value_folded]
+    
+    return match_keywords
+
+
+# キーワード照合関数をキャッシュしておく数（キーワードの組み合わせごと）
+KEYWORD_MATCHER_CACHE_SIZE = 128
+
+
+@functools.lru_cache(maxsize=KEYWORD_MATCHER_CACHE_SIZE)
+def get_keyword_matcher(keywords, first_match_only=False):
+    """
+    キーワード照合関数を取得する関数（結果はキャッシュされる）
+    
+    複数のファイルを検索する場合や、同じキーワードで検索を繰り返す場合に、
+    キーワードのcasefoldやオートマトンの構築をファイルやリクエストごとに繰り返さないようにします。
+    
+    引数:
+        keywords: 検索するキーワードのタプル（キャッシュのキーにするため、リストではなくタプル）
+        first_match_only: build_keyword_matcherと同じ
+    
+    戻り値:
+        function: build_keyword_matcherで作成したキーワード照合関数（スレッド間で共有しても安全）
+    
+    注意:
+        - キーワードの順序は照合結果の順序になるため、並べ替えずにキーとして使用します
+    """
+    return build_keyword_matcher(keywords, first_match_only)
+
+
+def iter_cell_values_with_calamine(file_path_str, row_filter=None):
+    """
+    python-calamineを使用して、Excelファイルの空でないセルの値を順に返すジェネレータ
+    
+    python-calamineはRustで実装されたExcelリーダーで、セルオブジェクトやスタイルを
+    生成せずにセルの値をPythonのリストとして直接取得できるため、openpyxlより高速です。
+    .xlsファイルにも対応しています。
+    
+    引数:
+        file_path_str: Excelファイルのパス（文字列）
+        row_filter: 行の値のリストを受け取り、その行のセルを返すかどうかを判定する関数（オプション）
+                    Falseを返した行のセルはすべてスキップされます
+    
+    戻り値:
+        generator: (シート名, 行番号, 列番号, 値) のタプル（行番号・列番号は1から始まる）
+    """
+    wb = CalamineWorkbook.from_path(file_path_str)
+    
+    # グラフシートなどはセルを持たないため、ワークシートのみを対象とする
+    sheet_names = [
+        sheet_metadata.name for sheet_metadata in wb.sheets_metadata
+        if sheet_metadata.typ == SheetTypeEnum.WorkSheet
+    ]
+    
+    for sheet_name in sheet_names:
+        sheet = wb.get_sheet_by_name(sheet_name)
+        if sheet.start is None:
+            continue  # 空のシート
+        
+        # skip_empty_area=Trueでは、データが存在する範囲の左上（start）から値が返される
+        # そのため、startの位置を行番号・列番号に加算する（startは0から始まる）
+        start_row, start_col = sheet.start
+        rows = sheet.to_python(skip_empty_area=True)
+        for row_idx, row in enumerate(rows, start=start_row + 1):
+            # 行単位の判定で除外された行は、セルごとの処理を行わない
+            if row_filter is not None and not row_filter(row):
+                continue
+            for col_idx, value in enumerate(row, start=start_col + 1):
+                # 空セルは空文字列として返されるため、スキップする
+                if value is None or value == '':
+                    continue
+                # 数値セルはfloatとして返されるため、整数値の場合はopenpyxlと同じくintに変換する
+                # （例: 12345.0 -> 12345、キーワード検索時の文字列表現をそろえるため）
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                # 時刻を含まない日付のセルはdateとして返されるため、openpyxlと同じくdatetimeに変換する
+                # （例: 2024-01-01 -> 2024-01-01 00:00:00、キーワード検索時の文字列表現をそろえるため）
+                elif value.__class__ is date:
+                    value = datetime(value.year, value.month, value.day)
+                yield sheet_name, row_idx, col_idx, value
+
+
+def iter_cell_values_with_openpyxl(file_path_str, row_filter=None):
+    """
+    openpyxlを使用して、Excelファイルの空でないセルの値を順に返すジェネレータ
+    
+    引数:
+        file_path_str: Excelファイルのパス（文字列）
+        row_filter: 行の値のタプルを受け取り、その行のセルを返すかどうかを判定する関数（オプション）
+                    Falseを返した行のセルはすべてスキップされます
+    
+    戻り値:
+        generator: (シート名, 行番号, 列番号, 値) のタプル（行番号・列番号は1から始まる）
+    """
+    # Excelファイルを開く
+    # read_only=True: 読み取り専用モード（セルオブジェクトやスタイルを保持せず、メモリ使用量がほぼ一定）
+    # data_only=True: 計算式の結果のみを取得（計算式自体は取得しない）
+    # keep_links=False: 外部リンクの情報を読み込まない（検索には不要）
+    wb = openpyxl.load_workbook(file_path_str, read_only=True, data_only=True, keep_links=False)
+    
     try:
-        # file_pathがPathオブジェクトの場合は文字列に変換
-        # openpyxlは文字列形式のパスを期待するため
-        file_path_str = str(file_path) if isinstance(file_path, Path) else file_path
-        
-        # Excelファイルを開く
-        # data_only=True: 計算式の結果のみを取得（計算式自体は取得しない）
-        wb = openpyxl.load_workbook(file_path_str, data_only=True)
-        
-        # 各シートを順に処理
-        for sheet_name in wb.sheetnames:
-            sheet = wb[sheet_name]
+        # 各シートを順に処理（グラフシートはセルを持たないため、worksheetsのみを対象とする）
+        for sheet in wb.worksheets:
+            sheet_name = sheet.title
+            
+            # 一部のツールで作成されたファイルは、シートのサイズ情報が正しくない（A1:A1）ことがある
+            # その場合はサイズ情報をリセットして、実際のデータをすべて読み込む
+            try:
+                if sheet.calculate_dimension() == 'A1:A1':
+                    sheet.reset_dimensions()
+            except ValueError:
+                pass  # サイズ情報がない場合は、そのまま全データを読み込める
             
-            # 各行を走査（values_only=Falseでセルオブジェクトを取得）
-            # enumerate(..., start=1)で行番号を1から始める
-            for row_idx, row in enumerate(sheet.iter_rows(values_only=False), start=1):
-                # 各列（セル）を走査
-                for col_idx, cell in enumerate(row, start=1):
+            # 各行を走査（values_only=Trueでセルの値のみを取得し、セルオブジェクトを生成しない）
+            # データが存在する範囲の左上（シートのサイズ情報の開始位置）から読み込むことで、
+            # 先頭の空の行や列のNoneを生成しない（iter_rowsは指定しない場合、常にA1から返す）
+            min_row = sheet.min_row
+            min_col = sheet.min_column
+            for row_idx, row in enumerate(
+                sheet.iter_rows(min_row=min_row, min_col=min_col, values_only=True), start=min_row
+            ):
+                # 行単位の判定で除外された行は、セルごとの処理を行わない
+                if row_filter is not None and not row_filter(row):
+                    continue
+                # 各列（セルの値）を走査
+                for col_idx, value in enumerate(row, start=min_col):
                     # セルの値がNoneの場合はスキップ（空セル）
-                    if cell.value is None:
+                    if value is None:
                         continue
-                    
-                    # セルの値を文字列に変換
-                    cell_value = str(cell.value)
-                    
-                    # 各キーワードをチェック
-                    for keyword in keywords:
-                        # 大文字小文字を区別しない検索
-                        # セルの値とキーワードの両方を小文字に変換して比較
-                        if keyword.lower() in cell_value.lower():
-                            # マッチした場合は結果リストに追加
-                            results.append({
-                                'sheet': sheet_name,  # シート名
-                                'row': row_idx,  # 行番号（1から始まる）
-                                'col': col_idx,  # 列番号（1から始まる）
-                                'value': cell_value,  # セルの値
-                                'keyword': keyword,  # マッチしたキーワード
-                                'file': file_path_str  # ファイルパス（後で上書きされる可能性がある）
-                            })
-        
-        # Excelファイルを閉じる（メモリリークを防ぐ）
+                    yield sheet_name, row_idx, col_idx, value
+    finally:
+        # Excelファイルを閉じる（読み取り専用モードではファイルハンドルを開いたままにするため必須）
         wb.close()
-    except Exception as e:
-        # エラーが発生した場合は、エラー情報をログに記録
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"Error processing {file_path}: {error_trace}")
-        app.logger.error(f"Error processing {file_path}: {error_trace}")
-        # エラーが発生しても空のリストを返す（他のファイルの処理を継続）
+
+
+def iter_excel_cell_values(file_path_str, row_filter=None):
+    """
+    Excelファイルの空でないセルの値を順に返すジェネレータ
     
-    return results
+    python-calamineが利用できる場合はそれを使用し、利用できない場合はopenpyxlを使用します。
+    
+    引数:
+        file_path_str: Excelファイルのパス（文字列）
+        row_filter: 行の値のシーケンスを受け取り、その行のセルを返すかどうかを判定する関数（オプション）
+                    行の値には空セル（Noneまたは空文字列）も含まれます
+    
+    戻り値:
+        generator: (シート名, 行番号, 列番号, 値) のタプル（行番号・列番号は1から始まる）
+    
+    注意:
+        - python-calamineはエラー値（#N/Aなど）のセルを空文字列として返すため、
+          エラー値のセルがある.xlsxファイルは、openpyxlで読み込みます（エラー値を文字列として返す）
+    """
+    if CALAMINE_AVAILABLE and not excel_file_has_error_cells(file_path_str):
+        return iter_cell_values_with_calamine(file_path_str, row_filter)
+    return iter_cell_values_with_openpyxl(file_path_str, row_filter)
 
 
-def create_results_workbook(search_results, keywords):
+# 行単位の判定で、行のセルの値を連結するときの区切り文字
+# キーワードに含まれない文字で区切るため、複数のセルにまたがってキーワードがマッチすることはない
+ROW_VALUE_SEPARATOR = '\x00'
+
+
+def build_row_filter(keywords, match_keywords, scan_non_string):
     """
-    検索結果をExcelブックに出力する関数
+    キーワードを含むセルがない行を除外する、行単位の判定関数を作成する関数
     
-    検索結果のリストを受け取り、見やすい形式でExcelファイルに出力します。
-    各検索結果に対して、ファイル名、シート名、行、列、セル値、キーワード、ファイルパスを
-    記録します。また、ハイパーリンクを設定して、元のExcelファイルや該当セルに
-    直接ジャンプできるようにします。
+    行の文字列のセルの値を区切り文字で連結し、照合関数を行ごとに1回だけ呼び出して判定します。
+    大半の行はキーワードを含まないため、セルごとにPythonのループで照合するより高速です。
+    キーワードを含む行だけ、セルごとに照合してマッチしたセルを特定します。
     
     引数:
-        search_results: 検索結果のリスト（search_keywords_in_excelの戻り値）
-        keywords: 検索に使用したキーワードのリスト（行の色分けに使用）
+        keywords: 検索するキーワードのリスト
+        match_keywords: build_keyword_matcherで作成したキーワード照合関数
+        scan_non_string: 数値・日時のセルにマッチする可能性のあるキーワードがあるか
     
     戻り値:
-        Workbook: 作成されたExcelワークブックオブジェクト
+        function: 行の値のシーケンスを受け取り、キーワードを含むセルがある可能性がある場合にTrueを返す関数
+                  行単位で判定できない場合はNone
+    
+    注意:
+        - 数値・日時のセルにマッチする可能性のあるキーワードがある場合は判定しません
+          （リーダーによって数値の文字列表現が異なる場合があるため、セルごとに判定する）
+        - 区切り文字を含むキーワードがある場合は判定しません
+    """
+    if scan_non_string or any(ROW_VALUE_SEPARATOR in keyword for keyword in keywords):
+        return None
+    
+    def row_may_match(row_values):
+        # セルごとの判定と同じく、数値・日時のセルは除外し、それ以外の値は文字列に変換する
+        # casefoldは1文字ずつ変換するため、連結した文字列をまとめて変換しても結果は同じ
+        row_strings = [
+            value if isinstance(value, str) else str(value)
+            for value in row_values
+            if value is not None and not isinstance(value, NON_STRING_VALUE_TYPES)
+        ]
+        if not row_strings:
+            return False
+        return bool(match_keywords(ROW_VALUE_SEPARATOR.join(row_strings).casefold()))
+    
+    return row_may_match
+
+
+# 事前確認で読み込む共有文字列のXMLのタグ（タグを除いてテキストだけを連結する）
+SHARED_STRINGS_TAG_PATTERN = re.compile(r'<[^>]*>')
+
+# 共有文字列のXMLのエスケープ（例: _x000D_）
+# python-calamineは読み込み時に文字に戻すが、openpyxlはそのままの文字列として読み込む
+SHARED_STRINGS_ESCAPE_PATTERN = re.compile(r'_x([0-9A-Fa-f]{4})_')
+
+# 共有文字列以外の文字列を持つセル（インライン文字列、数式の文字列の結果、エラー値）の型の指定
+WORKSHEET_INLINE_STRING_PATTERN = re.compile(rb"""\bt\s*=\s*["'](?:inlineStr|str|e)["']""")
+
+# エラー値（#N/Aなど）のセルの型の指定
+WORKSHEET_ERROR_CELL_PATTERN = re.compile(rb"""\bt\s*=\s*["']e["']""")
+
+# ワークシートのXMLを読み込む単位（バイト）
+WORKSHEET_PRESCREEN_CHUNK_SIZE = 1024 * 1024
+
+
+def zip_member_contains_pattern(zf, member_name, pattern):
+    """
+    ZIPファイル内のファイル（ワークシートのXMLなど）に、パターンにマッチする部分があるかを判定する関数
+    
+    引数:
+        zf: ZipFileオブジェクト
+        member_name: ZIPファイル内のファイル名
+        pattern: 検索するパターン（バイト列の正規表現、32バイト以内にマッチするもの）
+    
+    戻り値:
+        bool: マッチする部分がある場合はTrue
+    
+    注意:
+        - ワークシートのXMLは大きい場合があるため、分割して読み込みます
+    """
+    with zf.open(member_name) as member_file:
+        previous_tail = b''
+        while True:
+            chunk = member_file.read(WORKSHEET_PRESCREEN_CHUNK_SIZE)
+            if not chunk:
+                return False
+            # 分割の境界をまたぐ部分も検出できるように、直前の末尾を連結して検索
+            # （分割の単位が32バイトより小さい場合も、直前の32バイトを引き継ぐ）
+            data = previous_tail + chunk
+            if pattern.search(data):
+                return True
+            previous_tail = data[-32:]
+
+
+def excel_file_has_error_cells(file_path_str):
+    """
+    Excelファイル（.xlsx）にエラー値（#N/A、#DIV/0!など）のセルがあるかを判定する関数
+    
+    python-calamineはエラー値のセルを空文字列として返すため、エラー値のセルがある
+    ファイルは、エラー値を文字列として返すopenpyxlで読み込む必要があります。
+    
+    引数:
+        file_path_str: Excelファイルのパス（文字列）
+    
+    戻り値:
+        bool: エラー値のセルがある場合はTrue
+              （.xlsファイルなど、判定できない場合はFalse）
+    """
+    try:
+        with zipfile.ZipFile(file_path_str) as zf:
+            return any(
+                zip_member_contains_pattern(zf, name, WORKSHEET_ERROR_CELL_PATTERN)
+                for name in zf.namelist()
+                if name.startswith('xl/worksheets/') and name.endswith('.xml')
+            )
+    except (OSError, zipfile.BadZipFile, KeyError):
+        return False  # .xlsファイルなど、ZIP形式でない場合（openpyxlでは読み込めない）
+
+
+def shared_strings_may_contain_keywords(shared_strings_xml, keywords):
+    """
+    共有文字列のXMLのテキストに、いずれかのキーワードが含まれる可能性があるかを判定する関数
+    
+    引数:
+        shared_strings_xml: 共有文字列（xl/sharedStrings.xml）のXMLの文字列
+        keywords: 検索するキーワードのリスト
+    
+    戻り値:
+        bool: いずれかのキーワードが含まれる可能性がある場合はTrue
+    """
+    # タグを除いてテキストだけを連結し、文字参照（&amp;など）を元の文字に戻す
+    shared_strings_text = html.unescape(SHARED_STRINGS_TAG_PATTERN.sub('', shared_strings_xml))
+    
+    # openpyxlは_x005F_（アンダースコアのエスケープ）の一部だけを取り除いて読み込むため、
+    # 含まれる場合は、セルの値がテキストのどの部分になるか判定できない
+    if 'x005F_' in shared_strings_text:
+        return True
+    
+    # エスケープ（_x000D_など）は、読み込み方法によってそのままの場合（openpyxl）と
+    # 元の文字に戻す場合（python-calamine）があるため、両方のテキストで判定する
+    shared_strings_texts = [shared_strings_text]
+    unescaped_text = SHARED_STRINGS_ESCAPE_PATTERN.sub(
+        lambda match: chr(int(match.group(1), 16)), shared_strings_text
+    )
+    if unescaped_text != shared_strings_text:
+        shared_strings_texts.append(unescaped_text)
+    shared_strings_folded = [text.casefold() for text in shared_strings_texts]
+    
+    return any(
+        keyword.casefold() in text_folded
+        for keyword in keywords
+        for text_folded in shared_strings_folded
+    )
+
+
+def excel_file_may_contain_keywords(file_path_str, keywords):
+    """
+    Excelファイル（.xlsx）にキーワードを含むセルが存在する可能性があるかを事前に判定する関数
+    
+    .xlsxファイルの文字列のセルの値は、共有文字列（xl/sharedStrings.xml）にまとめて保存されています。
+    共有文字列のテキスト全体にどのキーワードも含まれていなければ、どのセルにもマッチしないため、
+    シートを解析せずにファイル全体をスキップできます。
     
     処理の流れ:
-        1. 新しいワークブックを作成
-        2. ヘッダー行を設定（スタイル付き）
-        3. 各検索結果を行として追加
-        4. ハイパーリンクを設定（ファイル名、セル値、ファイルパス）
-        5. キーワードに応じて行の色を変更
-        6. 列幅を自動調整
-    """
-    # 新しいワークブックを作成
-    wb = Workbook()
-    ws = wb.active  # アクティブなワークシートを取得
-    ws.title = "検索結果"  # シート名を設定
+        1. 共有文字列（ワークシートより小さい）を読み込み、キーワードを含む場合はTrueを返す
+        2. 含まない場合のみ、共有文字列を使用しない文字列のセルがワークシートにあるかを確認する
     
-    # ヘッダー行の定義
-    # 検索結果のExcelファイルに表示する列名
-    headers = ['ファイル名', 'シート名', '行', '列', 'セル値', 'キーワード', 'ファイルパス']
-    ws.append(headers)  # ヘッダー行を追加
+    引数:
+        file_path_str: Excelファイルのパス（文字列）
+        keywords: 検索するキーワードのリスト
     
-    # ヘッダー行のスタイル設定
-    # 背景色: 青色（#4472C4）、文字色: 白色、太字
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
+    戻り値:
+        bool: キーワードを含むセルが存在する可能性がある場合はTrue
+              （Falseの場合は、どのセルにもマッチしないことが確実）
     
-    # 各ヘッダーセルにスタイルを適用
-    for col in range(1, len(headers) + 1):
-        cell = ws.cell(row=1, column=col)
-        cell.fill = header_fill  # 背景色を設定
-        cell.font = header_font  # フォントを設定
-        cell.alignment = Alignment(horizontal="center", vertical="center")  # 中央揃え
+    注意:
+        - 判定できない場合（.xlsファイル、想定外の構造など）は常にTrueを返します
+        - 数値・日時のセルにマッチする可能性のあるキーワードがある場合は常にTrueを返します
+        - 共有文字列を使用しない文字列のセル（インライン文字列、数式の文字列の結果、エラー値）が
+          ワークシートに含まれる場合は常にTrueを返します
+        - 共有文字列のテキストはすべて連結して判定するため、誤ってTrueを返すことはありますが、
+          誤ってFalseを返すことはありません
+        - 共有文字列にキーワードが含まれる場合（この後シートを解析する場合）は、
+          ワークシートのXMLを展開しません
+    """
+    # 数値・日時のセルは共有文字列に含まれないため、事前確認では判定できない
+    if not keywords or keywords_can_match_non_string(keywords):
+        return True
     
-    # ========================================================================
-    # データ行の処理
-    # ========================================================================
-    # 各検索結果を行として追加し、ハイパーリンクを設定
-    for result in search_results:
-        file_path = result['file']  # 元のExcelファイルのパス
-        file_path_obj = Path(file_path)
-        
-        # ファイルパスを絶対パスに変換（ハイパーリンク用）
-        # ハイパーリンクは絶対パスでないと正しく動作しないため
-        try:
-            if file_path_obj.exists():
-                # ファイルが存在する場合は、絶対パスに解決
-                absolute_file_path = str(file_path_obj.resolve())
-            else:
-                # ファイルが存在しない場合（アップロードされたファイルなど）は、そのまま使用
-                absolute_file_path = str(file_path_obj)
-        except:
-            # エラーが発生した場合は、元のパス文字列を使用
-            absolute_file_path = str(file_path)
-        
-        # ハイパーリンク用のパス形式に変換
-        # WindowsとLinux/Macで形式が異なるため、プラットフォームを判定
-        if platform.system() == 'Windows':
-            # Windowsの場合: file:///C:/path/to/file.xlsx の形式
-            # バックスラッシュをスラッシュに変換
-            hyperlink_path = absolute_file_path.replace('\\', '/')
-            # file:///プレフィックスを追加（3つのスラッシュ）
-            hyperlink_path = f"file:///{hyperlink_path}"
-        else:
-            # Linux/Macの場合: file:///path/to/file.xlsx の形式
-            hyperlink_path = f"file://{absolute_file_path}"
+    try:
+        with zipfile.ZipFile(file_path_str) as zf:
+            names = zf.namelist()
+            worksheet_names = [
+                name for name in names
+                if name.startswith('xl/worksheets/') and name.endswith('.xml')
+            ]
+            if not worksheet_names:
+                return True  # 想定外の構造
+            
+            # 共有文字列にキーワードが含まれる場合は、マッチするセルがある可能性がある
+            # （共有文字列がない場合は、共有文字列を使用する文字列のセルが1つもない）
+            shared_strings_names = [name for name in names if name.lower().endswith('sharedstrings.xml')]
+            shared_strings_xml = ''.join(
+                zf.read(name).decode('utf-8', errors='replace') for name in shared_strings_names
+            )
+            if shared_strings_may_contain_keywords(shared_strings_xml, keywords):
+                return True
+            
+            # 共有文字列以外の文字列を持つセルがあるワークシートがある場合は判定できない
+            for worksheet_name in worksheet_names:
+                if zip_member_contains_pattern(zf, worksheet_name, WORKSHEET_INLINE_STRING_PATTERN):
+                    return True
+    except (OSError, zipfile.BadZipFile, KeyError):
+        return True  # .xlsファイルなど、ZIP形式でない場合
+    
+    return False
+
+
+# ============================================================================
+# セルの値のインデックス
+# ============================================================================
+# 一度検索したExcelファイルのセルの値をSQLiteに保存しておき、同じファイルを再度検索する場合は
+# Excelファイルを解析せずにSQLiteから検索する
+# ファイルは内容のハッシュ値で識別するため、ファイルが変更された場合は自動的に作り直される
+# （アップロードのたびにファイル名が変わる場合でも、同じ内容のファイルであれば再利用される）
+
+# インデックスの形式のバージョン（形式を変更した場合は値を増やす）
+# バージョンが異なるインデックスは、開いたときに作り直される
+# 2: セルの値をlowerではなくcasefoldで保存
+# 3: エラー値（#N/Aなど）のセルも保存（以前のインデックスには含まれていないため作り直す）
+CELL_INDEX_SCHEMA_VERSION = 3
+
+CELL_INDEX_SCHEMA = (
+    """
+    CREATE TABLE files (
+        id INTEGER PRIMARY KEY,
+        digest TEXT NOT NULL UNIQUE,
+        last_used REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE cells (
+        file_id INTEGER NOT NULL,
+        sheet TEXT NOT NULL,
+        row INTEGER NOT NULL,
+        col INTEGER NOT NULL,
+        value TEXT NOT NULL,
+        value_folded TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX cells_file_id ON cells (file_id)",
+)
+
+# ファイル内容のハッシュ値を計算するときの読み込みサイズ（1MB）
+CELL_INDEX_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def open_cell_index():
+    """
+    セルの値のインデックス（SQLiteデータベース）を開く関数
+    
+    戻り値:
+        sqlite3.Connection: データベースへの接続（テーブルが存在しない場合は作成される）
+    
+    注意:
+        - 複数のプロセスから同時に書き込まれる場合があるため、ロックの待ち時間を長めに設定し、
+          WALモードを使用します
+        - 形式のバージョンが異なるインデックスは、テーブルを作り直します
+    """
+    conn = sqlite3.connect(str(CELL_INDEX_PATH), timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        
+        # バージョンの確認とテーブルの作成は、他のプロセスと同時に行わないよう排他的に行う
+        conn.execute("BEGIN IMMEDIATE")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != CELL_INDEX_SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS cells")
+            conn.execute("DROP TABLE IF EXISTS files")
+            for statement in CELL_INDEX_SCHEMA:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {CELL_INDEX_SCHEMA_VERSION}")
+        conn.commit()
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn
+
+
+def compute_file_digest(file_path_str):
+    """
+    ファイル内容のハッシュ値を計算する関数（インデックスのキーとして使用）
+    
+    引数:
+        file_path_str: ファイルのパス（文字列）
+    
+    戻り値:
+        str: ハッシュ値（16進数の文字列）
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path_str, 'rb') as f:
+        while True:
+            chunk = f.read(CELL_INDEX_HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_cell_index_rows(file_id, file_path_str):
+    """
+    インデックスに登録する行を順に返すジェネレータ
+    
+    引数:
+        file_id: インデックス上のファイルのID
+        file_path_str: Excelファイルのパス（文字列）
+    
+    戻り値:
+        generator: (ファイルID, シート名, 行番号, 列番号, 値, casefoldした値) のタプル
+    """
+    for sheet_name, row_idx, col_idx, value in iter_excel_cell_values(file_path_str):
+        # 数値・日時のセルも、キーワード検索と同じく文字列に変換して登録する
+        cell_value = value if isinstance(value, str) else str(value)
+        yield file_id, sheet_name, row_idx, col_idx, cell_value, cell_value.casefold()
+
+
+def get_indexed_file_id(conn, file_path_str):
+    """
+    Excelファイルのインデックス上のIDを取得する関数
+    
+    同じ内容のファイルがまだインデックスに登録されていない場合は、
+    Excelファイルを読み込んで、空でないすべてのセルの値を登録します。
+    
+    引数:
+        conn: インデックスへの接続（open_cell_indexの戻り値）
+        file_path_str: Excelファイルのパス（文字列）
+    
+    戻り値:
+        int: インデックス上のファイルのID
+    """
+    digest = compute_file_digest(file_path_str)
+    now = time.time()
+    
+    row = conn.execute("SELECT id FROM files WHERE digest = ?", (digest,)).fetchone()
+    if row is not None:
+        # 登録済みの場合は、最終使用日時のみを更新
+        with conn:
+            conn.execute("UPDATE files SET last_used = ? WHERE id = ?", (now, row[0]))
+        return row[0]
+    
+    # 未登録の場合は、セルの値を読み込んで登録（途中でエラーが発生した場合はロールバックされる）
+    with conn:
+        file_id = conn.execute(
+            "INSERT INTO files (digest, last_used) VALUES (?, ?)", (digest, now)
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO cells (file_id, sheet, row, col, value, value_folded) VALUES (?, ?, ?, ?, ?, ?)",
+            iter_cell_index_rows(file_id, file_path_str)
+        )
         
-        # 行データを構築
-        # ファイル名、シート名、行、列、セル値、キーワード、ファイルパス
-        row = [
-            Path(result['file']).name,  # ファイル名のみ（パスから抽出）
-            result['sheet'],  # シート名
-            result['row'],  # 行番号
-            result['col'],  # 列番号
-            result['value'],  # セルの値
-            result['keyword'],  # マッチしたキーワード
-            result['file']  # ファイルパス（フルパス）
+        # 登録ファイル数が上限を超えた場合は、最後に使用した日時が古いものから削除
+        stale_ids = [
+            stale_row[0] for stale_row in conn.execute(
+                "SELECT id FROM files ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+                (CELL_INDEX_MAX_FILES,)
+            )
         ]
-        ws.append(row)  # 行を追加
-        
-        # 現在の行番号を取得（ハイパーリンク設定用）
-        current_row = ws.max_row
-        
-        # ====================================================================
-        # ハイパーリンクの設定
-        # ====================================================================
-        
-        # ファイル名のセル（1列目）にハイパーリンクを設定
-        # クリックすると元のExcelファイルが開く
-        file_name_cell = ws.cell(row=current_row, column=1)
-        try:
-            if HYPERLINK_AVAILABLE:
-                # Hyperlinkオブジェクトを使用してハイパーリンクとツールチップを設定
-                try:
-                    file_name_cell.hyperlink = Hyperlink(
-                        target=hyperlink_path,  # リンク先のパス
-                        tooltip=f"クリックしてファイルを開く: {absolute_file_path}"  # ホバー時の説明
-                    )
-                except (TypeError, AttributeError):
-                    # 古いバージョンのopenpyxlではtooltipパラメータがない場合がある
-                    try:
-                        file_name_cell.hyperlink = Hyperlink(target=hyperlink_path)
-                    except Exception:
-                        # Hyperlinkオブジェクトの作成に失敗した場合は文字列を直接設定
-                        file_name_cell.hyperlink = hyperlink_path
+        for stale_id in stale_ids:
+            conn.execute("DELETE FROM cells WHERE file_id = ?", (stale_id,))
+            conn.execute("DELETE FROM files WHERE id = ?", (stale_id,))
+    
+    return file_id
+
+
+def can_use_cell_index(file_path_str):
+    """
+    Excelファイルの検索にセルの値のインデックスを使用できるかを判定する関数
+    
+    引数:
+        file_path_str: 検索対象のExcelファイルのパス（文字列）
+    
+    戻り値:
+        bool: インデックスを使用する場合はTrue
+    
+    注意:
+        - アップロードされたファイル（UPLOAD_FOLDER内のファイル）は、検索後に削除されるため
+          インデックスを作成しない（セルの値がインデックスに残り続けないようにする）
+    """
+    if not CELL_INDEX_ENABLED:
+        return False
+    try:
+        return not Path(file_path_str).resolve().is_relative_to(UPLOAD_FOLDER.resolve())
+    except OSError:
+        return False
+
+
+def search_keywords_in_cell_index(file_path_str, keywords, match_keywords):
+    """
+    セルの値のインデックスを使用して、Excelファイル内でキーワードを検索する関数
+    
+    引数:
+        file_path_str: 検索対象のExcelファイルのパス（文字列）
+        keywords: 検索するキーワードのリスト
+        match_keywords: キーワード照合関数（build_keyword_matcherの戻り値）
+    
+    戻り値:
+        list: 検索結果のリスト（search_keywords_in_excelの戻り値と同じ形式・順序）
+    """
+    conn = open_cell_index()
+    try:
+        file_id = get_indexed_file_id(conn, file_path_str)
+        
+        # いずれかのキーワードを含むセルをSQLite側で絞り込む（大文字小文字を区別しない）
+        # どのキーワードがマッチしたかは、ファイルを直接検索する場合と同じ照合関数で判定する
+        keyword_conditions = " OR ".join(["instr(value_folded, ?) > 0"] * len(keywords))
+        query = (
+            "SELECT sheet, row, col, value, value_folded FROM cells "
+            f"WHERE file_id = ? AND ({keyword_conditions}) ORDER BY rowid"
+        )
+        params = [file_id] + [keyword.casefold() for keyword in keywords]
+        
+        results = []
+        for sheet_name, row_idx, col_idx, cell_value, value_folded in conn.execute(query, params):
+            for keyword in match_keywords(value_folded):
+                # ファイルパスは後で上書きされる可能性がある（アップロードされたファイルの場合は元のファイル名）
+                results.append(CellMatch(sheet_name, row_idx, col_idx, cell_value, keyword, file_path_str))
+        return results
+    finally:
+        conn.close()
+
+
+def search_keywords_in_excel(file_path, keywords, first_match_only=False):
+    """
+    Excelファイル内でキーワードを検索する関数
+    
+    指定されたExcelファイルの全シートを走査し、各セルの値をチェックして
+    キーワードが含まれているかどうかを判定します。
+    大文字小文字を区別しない検索を行います。
+    
+    引数:
+        file_path: 検索対象のExcelファイルのパス（Pathオブジェクトまたは文字列）
+        keywords: 検索するキーワードのリスト（例: ['キーワード1', 'キーワード2']）
+        first_match_only: Trueの場合は、1つのセルにつき最初にマッチしたキーワードだけを記録する
+    
+    戻り値:
+        list: 検索結果のリスト。各要素は以下の属性を持つCellMatch:
+            - sheet: シート名
+            - row: 行番号（1から始まる）
+            - col: 列番号（1から始まる）
+            - value: セルの値（文字列）
+            - keyword: マッチしたキーワード
+            - file: ファイルパス
+    
+    処理の流れ:
+        1. セルの値のインデックスが利用できる場合は、インデックスから検索して終了
+           （未登録のファイルは、以下と同じ方法で読み込んでインデックスに登録する）
+        2. 共有文字列にどのキーワードも含まれていないファイルは、解析せずにスキップ
+        3. Excelファイルを開く（python-calamineが利用できる場合はそれを使用し、
+           利用できない場合はopenpyxlの読み取り専用モードを使用）
+        4. 各シートを順に処理
+        5. 空でない各セルの値を走査
+        6. セルの値を文字列に変換し、各キーワードと比較（大文字小文字を区別しない）
+        7. マッチした場合は結果リストに追加
+    """
+    results = []
+    try:
+        # file_pathがPathオブジェクトの場合は文字列に変換
+        # openpyxl/python-calamineは文字列形式のパスを期待するため
+        file_path_str = str(file_path) if isinstance(file_path, Path) else file_path
+        
+        # キーワード照合関数を取得（キーワードのcasefoldなどは、同じキーワードでは1回だけ行う）
+        match_keywords = get_keyword_matcher(tuple(keywords), first_match_only)
+        
+        # 共有文字列にどのキーワードも含まれていない場合は、シートを解析せずにスキップ
+        # （インデックスの作成や検索よりも先に判定し、マッチしないファイルはインデックスも作成しない）
+        if not excel_file_may_contain_keywords(file_path_str, keywords):
+            return results
+        
+        # セルの値のインデックスが有効な場合は、インデックスから検索
+        # インデックスを利用できない場合（書き込みできない環境など）は、ファイルを直接検索する
+        if keywords and can_use_cell_index(file_path_str):
+            try:
+                return search_keywords_in_cell_index(file_path_str, keywords, match_keywords)
+            except sqlite3.Error as e:
+                app.logger.warning(f"Cell index unavailable for {file_path}, scanning file: {str(e)}")
+        
+        # 数値・日時のセルにマッチする可能性のあるキーワードがあるかを事前に判定
+        scan_non_string = keywords_can_match_non_string(keywords)
+        
+        # キーワードを含むセルがない行は、行単位でまとめて除外する
+        row_filter = build_row_filter(keywords, match_keywords, scan_non_string)
+        
+        # 空でない各セルの値を順に走査（シート名、行番号、列番号、値）
+        for sheet_name, row_idx, col_idx, value in iter_excel_cell_values(file_path_str, row_filter):
+            if isinstance(value, str):
+                cell_value = value
             else:
-                # Hyperlinkクラスが利用できない場合は文字列を直接設定
-                file_name_cell.hyperlink = hyperlink_path
+                # 数値・日時のセルにマッチするキーワードがない場合は、文字列に変換せずにスキップ
+                if not scan_non_string and isinstance(value, NON_STRING_VALUE_TYPES):
+                    continue
+                # セルの値を文字列に変換
+                cell_value = str(value)
             
-            # ハイパーリンクのスタイル設定（青色、下線付き）
-            file_name_cell.font = Font(color="0563C1", underline="single")
+            # 各キーワードをチェック
+            # 大文字小文字を区別しない検索（セルの値のcasefoldはセルごとに1回だけ行う）
+            for keyword in match_keywords(cell_value.casefold()):
+                # マッチした場合は結果リストに追加
+                # ファイルパスは後で上書きされる可能性がある（アップロードされたファイルの場合は元のファイル名）
+                results.append(CellMatch(sheet_name, row_idx, col_idx, cell_value, keyword, file_path_str))
+    except Exception as e:
+        # エラーが発生した場合は、エラー情報をログに記録
+        # logger.exceptionはログが出力される場合にのみスタックトレースを文字列に変換する
+        app.logger.exception(f"Error processing {file_path}")
+        # エラーが発生しても空のリストを返す（他のファイルの処理を継続）
+    
+    return results
+
+
+# 複数のプロセスで並列に検索するファイル数の下限
+# これより少ない場合は、プロセスの起動コストの方が大きいため順番に検索する
+PARALLEL_SEARCH_MIN_FILES = 4
+
+# プロセスプールが利用できない場合に、スレッドで並列に検索するときの最大スレッド数
+THREAD_SEARCH_MAX_WORKERS = 8
+
+# 並列処理のプロセスの起動方法
+# fork（Linuxの既定）では、親プロセスのスレッド（結果ブックの書き出しやリクエストの処理）が
+# ロックを保持している状態のままコピーされ、子プロセスが停止する（デッドロック）おそれがあるため、
+# スレッドを持たないサーバープロセスから子プロセスを作成するforkserverを使用する
+# （forkserverが利用できない環境（Windows）ではspawn）
+PARALLEL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+PARALLEL_MP_CONTEXT = multiprocessing.get_context(PARALLEL_START_METHOD)
+if PARALLEL_START_METHOD == 'forkserver':
+    # サーバープロセスの起動時にこのモジュールを1回だけ読み込み、子プロセスはそれを引き継ぐ
+    # （子プロセスごとにFlaskやopenpyxlなどを読み込み直さない）
+    PARALLEL_MP_CONTEXT.set_forkserver_preload([__name__])
+
+
+def map_files_in_parallel(function, file_paths, *args):
+    """
+    複数のファイルに対して同じ処理を並列に実行する関数
+    
+    Excelファイルの解析（XMLのパース）はCPU負荷が高く、ファイルごとに独立しているため、
+    ProcessPoolExecutorで複数のプロセスに分散して処理します。
+    プロセスプールが利用できない環境では、ThreadPoolExecutorで処理し、
+    スレッドも利用できない場合は順番に処理します。
+    
+    引数:
+        function: ファイルごとに呼び出す関数（function(file_path, *args)の形式で呼び出される）
+                  プロセス間で受け渡すため、モジュールの最上位で定義された関数であること
+        file_paths: 処理対象のファイルのパスのリスト
+        *args: すべてのファイルで共通の、functionに渡す引数
+    
+    戻り値:
+        list: ファイルごとのfunctionの戻り値のリスト（順序はfile_pathsと同じ）
+    
+    注意:
+        - functionは例外を発生させないこと（ファイルごとのエラーはfunction内で処理する）
+        - 子プロセスはforkserver（Windowsではspawn）で起動するため、このモジュールを実行する
+          スクリプトは、起動処理をif __name__ == '__main__':の中に書くこと
+    """
+    # 各ファイルに渡す共通の引数（executor.mapにはファイルごとの引数の列として渡す）
+    repeated_args = [repeat(arg) for arg in args]
+    
+    # ファイルが少ない場合は、プロセスの起動コストの方が大きいため順番に処理
+    if len(file_paths) < PARALLEL_SEARCH_MIN_FILES:
+        return [function(file_path, *args) for file_path in file_paths]
+    
+    max_workers = min(len(file_paths), os.cpu_count() or 1)
+    # 小さなファイルが多い場合は、まとめてワーカーに渡してプロセス間通信の回数を減らす
+    chunksize = max(1, len(file_paths) // (max_workers * 4))
+    
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=PARALLEL_MP_CONTEXT) as executor:
+            return list(executor.map(function, file_paths, *repeated_args, chunksize=chunksize))
+    except (OSError, NotImplementedError, BrokenProcessPool) as e:
+        # プロセスプールが利用できない環境（共有メモリがないサーバーレス環境など）ではスレッドで処理
+        # ZIPの展開（zlib）やXMLの解析（lxml）、python-calamineの読み込みはGILを解放するため、
+        # スレッドでもファイルの読み込みと解析を重ねて実行できる
+        app.logger.warning(f"Process pool unavailable, processing files with threads: {str(e)}")
+    
+    try:
+        with ThreadPoolExecutor(max_workers=min(len(file_paths), THREAD_SEARCH_MAX_WORKERS)) as executor:
+            return list(executor.map(function, file_paths, *repeated_args))
+    except RuntimeError as e:
+        # スレッドも作成できない場合は順番に処理
+        app.logger.warning(f"Thread pool unavailable, processing files sequentially: {str(e)}")
+        return [function(file_path, *args) for file_path in file_paths]
+
+
+def search_keywords_in_excel_files(file_paths, keywords, first_match_only=False):
+    """
+    複数のExcelファイル内でキーワードを並列に検索する関数
+    
+    ファイルごとの検索（search_keywords_in_excel）を、map_files_in_parallelで
+    複数のプロセス（またはスレッド）に分散して実行します。
+    
+    引数:
+        file_paths: 検索対象のExcelファイルのパスのリスト
+        keywords: 検索するキーワードのリスト
+        first_match_only: Trueの場合は、1つのセルにつき最初にマッチしたキーワードだけを記録する
+    
+    戻り値:
+        list: ファイルごとの検索結果（search_keywords_in_excelの戻り値）のリスト
+              順序はfile_pathsと同じ
+    """
+    # プロセス間で受け渡すため、パスは文字列に変換する
+    file_paths = [str(file_path) for file_path in file_paths]
+    return map_files_in_parallel(search_keywords_in_excel, file_paths, keywords, first_match_only)
+
+
+# ============================================================================
+# 検索結果ブックのスタイル
+# ============================================================================
+# セルごとにスタイルオブジェクトを作成しないよう、モジュールレベルで一度だけ作成して使い回す
+
+# ヘッダー行のスタイル
+# 背景色: 青色（#4472C4）、文字色: 白色、太字、中央揃え
+HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+
+# ハイパーリンクのスタイル（青色、下線付き）
+HYPERLINK_FONT = Font(color="0563C1", underline="single")
+
+# 通常のフォント（黒色）
+NORMAL_FONT = Font(color="000000")
+
+# キーワードごとの行の背景色
+# キーワードの指定順に割り当て、色の数より多いキーワードは先頭の色から順に繰り返して使用する
+KEYWORD_FILL_COLORS = [
+    "FFE6E6",  # 1番目のキーワード: 薄い赤
+    "E6F3FF",  # 2番目のキーワード: 薄い青
+    "E6FFE6",  # 3番目のキーワード: 薄い緑
+    "FFFFE6",  # 4番目のキーワード: 薄い黄
+    "F3E6FF",  # 5番目のキーワード: 薄い紫
+    "FFF0E0",  # 6番目のキーワード: 薄いオレンジ
+]
+KEYWORD_FILLS = [
+    PatternFill(start_color=color, end_color=color, fill_type="solid")
+    for color in KEYWORD_FILL_COLORS
+]
+
+# キーワードに対応する色がない場合の背景色（白）
+WHITE_FILL = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
+
+# シート名をシングルクォートで囲む必要がある文字（スペース、ハイフン、記号）
+SHEET_NAME_QUOTE_PATTERN = re.compile(r"[ \-!@#$%^&*()]")
+
+
+# 列番号（1から始まる）に対応するExcelの列文字の一覧（A, B, ..., XFD）
+# Excelの最大列数（16384列）まで事前に作成しておき、変換を配列の参照だけで済ませる
+EXCEL_MAX_COLUMNS = 16384
+COLUMN_LETTERS = [get_column_letter(i) for i in range(1, EXCEL_MAX_COLUMNS + 1)]
+
+
+def column_number_to_letter(col_num):
+    """
+    列番号をExcelの列文字に変換する関数
+    
+    引数:
+        col_num: 列番号（1から始まる）
+    
+    戻り値:
+        str: Excelの列文字（A, B, C, ..., Z, AA, AB, ...）
+    """
+    if 1 <= col_num <= EXCEL_MAX_COLUMNS:
+        return COLUMN_LETTERS[col_num - 1]
+    # 範囲外の列番号はopenpyxlの変換に任せる（不正な値の場合は例外になる）
+    return get_column_letter(col_num)
+
+
+def build_cell_style(ws, font=None, fill=None, alignment=None):
+    """
+    フォント・塗りつぶし・配置の組み合わせに対応するセルのスタイルを作成する関数
+    
+    セルごとにfontやfillを設定すると、そのたびにワークブックへのスタイルの登録処理が
+    行われるため、組み合わせごとにスタイルを一度だけ作成し、各セルの_styleに直接割り当てます。
+    
+    引数:
+        ws: スタイルを登録するワークシート（書き込み専用モード）
+        font: フォント（省略時は既定のフォント）
+        fill: 塗りつぶし（省略時は塗りつぶしなし）
+        alignment: 配置（省略時は既定の配置）
+    
+    戻り値:
+        StyleArray: セルの_styleに割り当てるスタイル
+    
+    注意:
+        - スタイルは複数のセルで共有するため、割り当てたセルのfontやfillなどは変更しないでください
+          （変更すると、同じスタイルを共有するすべてのセルに反映されてしまいます）
+    """
+    template_cell = WriteOnlyCell(ws)
+    if font is not None:
+        template_cell.font = font
+    if fill is not None:
+        template_cell.fill = fill
+    if alignment is not None:
+        template_cell.alignment = alignment
+    return template_cell._style
+
+
+def set_cell_hyperlink(cell, target, tooltip):
+    """
+    セルにハイパーリンクを設定し、ハイパーリンクのスタイルを適用する関数
+    
+    引数:
+        cell: ハイパーリンクを設定するセル
+        target: リンク先のパス（file://形式、セル参照を含む場合は #シート名!A1 を付加）
+        tooltip: ホバー時に表示する説明
+    
+    注意:
+        - Hyperlinkクラスが利用できない場合、またはHyperlinkオブジェクトの作成に
+          失敗した場合は、文字列でハイパーリンクを設定します（ツールチップなし）
+        - ハイパーリンクのスタイル（青色、下線付き）は呼び出し側で設定します
+    """
+    if HYPERLINK_AVAILABLE:
+        # Hyperlinkオブジェクトを使用してハイパーリンクとツールチップを設定
+        try:
+            cell.hyperlink = Hyperlink(target=target, tooltip=tooltip)
+        except (TypeError, AttributeError):
+            # 古いバージョンのopenpyxlではtooltipパラメータがない場合がある
+            try:
+                cell.hyperlink = Hyperlink(target=target)
+            except Exception:
+                # Hyperlinkオブジェクトの作成に失敗した場合は文字列を直接設定
+                cell.hyperlink = target
+    else:
+        # Hyperlinkクラスが利用できない場合は文字列を直接設定
+        cell.hyperlink = target
+
+
+def to_file_hyperlink(absolute_file_path):
+    """
+    ファイルパスをハイパーリンク用のパス形式に変換する関数
+    
+    引数:
+        absolute_file_path: ファイルの絶対パス（文字列）
+    
+    戻り値:
+        str: file://形式のハイパーリンクパス
+    
+    注意:
+        - Windowsの場合: file:///C:/path/to/file.xlsx の形式（バックスラッシュをスラッシュに変換）
+        - Linux/Macの場合: file:///path/to/file.xlsx の形式
+    """
+    if IS_WINDOWS:
+        # file:///プレフィックスを追加（3つのスラッシュ）
+        return "file:///" + absolute_file_path.replace('\\', '/')
+    return "file://" + absolute_file_path
+
+
+def create_results_workbook(search_results, keywords):
+    """
+    検索結果をExcelブックに出力する関数
+    
+    検索結果のリストを受け取り、見やすい形式でExcelファイルに出力します。
+    各検索結果に対して、ファイル名、シート名、行、列、セル値、キーワード、ファイルパスを
+    記録します。また、ハイパーリンクを設定して、元のExcelファイルや該当セルに
+    直接ジャンプできるようにします。
+    
+    引数:
+        search_results: 検索結果のリスト（search_keywords_in_excelの戻り値）
+        keywords: 検索に使用したキーワードのリスト（行の色分けに使用）
+    
+    戻り値:
+        Workbook: 作成されたExcelワークブックオブジェクト
+    
+    処理の流れ:
+        1. 新しいワークブックを書き込み専用モードで作成
+        2. ファイルごとのパス情報（存在確認、絶対パス、ハイパーリンク）を事前に計算
+        3. 検索結果を1回走査して列幅を計算して設定（書き込み専用モードでは行の追加前に設定する必要がある）
+        4. ヘッダー行を追加（スタイル付き）
+        5. 各検索結果の行データを作成して、行として追加
+        6. ハイパーリンクを設定（ファイル名、セル値、ファイルパス）
+        7. キーワードに応じて行の色を変更
+    
+    注意:
+        - 書き込み専用モードのワークブックは、1回だけ保存できます
+    """
+    # 新しいワークブックを書き込み専用モードで作成
+    # 書き込み専用モードでは、行を追加するたびにファイルへ書き出されるため、
+    # 検索結果が多い場合でもすべてのセルをメモリに保持しない
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("検索結果")  # シート名を設定
+    
+    # ヘッダー行の定義
+    # 検索結果のExcelファイルに表示する列名
+    headers = ['ファイル名', 'シート名', '行', '列', 'セル値', 'キーワード', 'ファイルパス']
+    
+    # ========================================================================
+    # ファイルごとのパス情報の事前計算
+    # ========================================================================
+    # 同じファイルの検索結果が多いため、ファイルの存在確認や絶対パスへの変換は
+    # 結果ごとではなく、ファイルごとに一度だけ行う
+    # 値: (ファイルが存在するか, 絶対パス, ハイパーリンク用のパス, ファイル名)
+    path_info = {}
+    for result in search_results:
+        file_path = result.file
+        if file_path in path_info:
+            continue
+        
+        # ファイルパスを絶対パスに変換（ハイパーリンク用）
+        # ハイパーリンクは絶対パスでないと正しく動作しないため
+        file_path_obj = Path(file_path)
+        file_exists = False
+        try:
+            file_exists = file_path_obj.exists()
+            if file_exists:
+                # ファイルが存在する場合は、絶対パスに解決
+                absolute_file_path = str(file_path_obj.resolve())
+            else:
+                # ファイルが存在しない場合（アップロードされたファイルなど）は、そのまま使用
+                absolute_file_path = str(file_path_obj)
+        except:
+            # エラーが発生した場合は、元のパス文字列を使用
+            absolute_file_path = str(file_path)
+        
+        # ハイパーリンク用のパス形式に変換
+        # ファイル名はPathオブジェクトを作らずにos.path.basenameで取得する
+        path_info[file_path] = (
+            file_exists,
+            absolute_file_path,
+            to_file_hyperlink(absolute_file_path),
+            os.path.basename(file_path)
+        )
+    
+    # ========================================================================
+    # 列幅の自動調整
+    # ========================================================================
+    # 各列の内容に応じて列幅を自動調整し、見やすくする
+    # 書き込み専用モードでは、列幅の情報は最初の行より前に書き出されるため、
+    # 行を追加する前に、検索結果を1回走査して各列の最大文字数を求めて設定する
+    # 行データはここでは保持せず、行を追加するときに作成する
+    # （行を追加するたびにファイルへ書き出されるため、検索結果のリスト以外に
+    #   検索結果の数に比例するメモリを使用しない）
+    
+    def build_row(result):
+        # ファイル名、シート名、行、列、セル値、キーワード、ファイルパス
+        return [
+            path_info[result.file][3],  # ファイル名のみ（事前に計算したもの）
+            result.sheet,  # シート名
+            result.row,  # 行番号
+            result.col,  # 列番号
+            result.value,  # セルの値
+            result.keyword,  # マッチしたキーワード
+            result.file  # ファイルパス（フルパス）
+        ]
+    
+    max_lengths = [len(header) for header in headers]
+    for result in search_results:
+        # 各列の最大文字数を更新
+        for col_idx, value in enumerate(build_row(result)):
+            length = len(str(value)) if value is not None else 0
+            if length > max_lengths[col_idx]:
+                max_lengths[col_idx] = length
+    
+    # 列幅を調整（最大50文字まで、最小2文字の余白を追加）
+    for col_idx, max_length in enumerate(max_lengths):
+        ws.column_dimensions[COLUMN_LETTERS[col_idx]].width = min(max_length + 2, 50)
+    
+    # ========================================================================
+    # セルのスタイルの事前作成
+    # ========================================================================
+    # スタイルの組み合わせごとに一度だけ作成し、各セルにはそれを割り当てる
+    
+    # ヘッダー行のスタイル（背景色、フォント、中央揃え）
+    header_style = build_cell_style(ws, font=HEADER_FONT, fill=HEADER_FILL, alignment=HEADER_ALIGNMENT)
+    
+    # ハイパーリンクが設定されたセルのスタイル（青色、下線付き、背景色なし）
+    link_style = build_cell_style(ws, font=HYPERLINK_FONT)
+    
+    # キーワードごとの行のスタイル（背景色のみ、通常のフォント（黒色）+ 背景色）
+    # 同じキーワードが複数回指定された場合は、最初の色を使用する
+    keyword_styles = {}
+    for keyword_idx, keyword in enumerate(keywords):
+        if keyword not in keyword_styles:
+            fill = KEYWORD_FILLS[keyword_idx % len(KEYWORD_FILLS)]
+            keyword_styles[keyword] = (
+                build_cell_style(ws, fill=fill),
+                build_cell_style(ws, font=NORMAL_FONT, fill=fill)
+            )
+    
+    # キーワードに対応する色がない場合の行のスタイル（白）
+    default_row_styles = (
+        build_cell_style(ws, fill=WHITE_FILL),
+        build_cell_style(ws, font=NORMAL_FONT, fill=WHITE_FILL)
+    )
+    
+    # 各ヘッダーセルにスタイルを適用
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell._style = header_style  # 背景色、フォント、中央揃え
+        header_cells.append(cell)
+    ws.append(header_cells)  # ヘッダー行を追加
+    
+    # ========================================================================
+    # データ行の処理
+    # ========================================================================
+    # 各検索結果を行として追加し、ハイパーリンクを設定
+    for result in search_results:
+        file_path = result.file  # 元のExcelファイルのパス
+        
+        # ファイルごとに事前計算したパス情報を取得
+        file_exists, absolute_file_path, hyperlink_path, _ = path_info[file_path]
+        
+        # マッチしたキーワードに対応する行のスタイルを取得（デフォルトは白）
+        # 各キーワードに異なる色を割り当てて、検索結果を見やすくする
+        fill_style, normal_fill_style = keyword_styles.get(result.keyword, default_row_styles)
+        cell_value_style = fill_style  # セル値のセル（5列目）のハイパーリンクがない場合のスタイル
+        
+        # 行のセルを作成（スタイルとハイパーリンクを設定してから、行として追加する）
+        cells = [WriteOnlyCell(ws, value=value) for value in build_row(result)]
+        
+        # ====================================================================
+        # ハイパーリンクの設定
+        # ====================================================================
+        
+        # ファイル名のセル（1列目）にハイパーリンクを設定
+        # クリックすると元のExcelファイルが開く
+        file_tooltip = f"クリックしてファイルを開く: {absolute_file_path}"  # ホバー時の説明
+        try:
+            set_cell_hyperlink(cells[0], hyperlink_path, file_tooltip)
         except Exception as e:
             # エラーが発生しても処理を継続（ログ出力のみ）
             # ハイパーリンクの設定に失敗しても、検索結果の出力は継続
-            try:
-                import logging
-                logging.warning(f"Failed to set hyperlink for {file_path}: {str(e)}")
-            except:
-                pass
+            app.logger.warning(f"Failed to set hyperlink for {file_path}: {str(e)}")
         
         # セル値のセル（5列目）に特定のセルへのハイパーリンクを設定
         # クリックすると元のExcelファイルが開き、該当セルに直接ジャンプする
-        cell_value_cell = ws.cell(row=current_row, column=5)
+        cell_value_cell = cells[4]
         try:
             # ファイルパスが存在する場合、または絶対パスが取得できた場合はハイパーリンクを設定
             # アップロードされたファイルの場合、ファイル名のみの可能性があるが、可能な限りハイパーリンクを設定
-            if absolute_file_path and (file_path_obj.exists() or os.path.isabs(absolute_file_path) or '\\' in absolute_file_path or '/' in absolute_file_path):
+            if absolute_file_path and (file_exists or os.path.isabs(absolute_file_path) or '\\' in absolute_file_path or '/' in absolute_file_path):
                 # シート名とセル位置を含むハイパーリンクを作成
-                sheet_name = result['sheet']  # シート名
-                row_num = result['row']  # 行番号
-                col_num = result['col']  # 列番号
+                sheet_name = result.sheet  # シート名
+                row_num = result.row  # 行番号
+                col_num = result.col  # 列番号
+                
+                # 列番号をExcelの列文字（A, B, C...）に変換
+                # 例: 1 -> A, 2 -> B, 27 -> AA
+                col_letter = column_number_to_letter(col_num)
+                
+                # シート名に特殊文字が含まれている場合はシングルクォートで囲む
+                # Excelのセル参照では、特殊文字を含むシート名はクォートで囲む必要がある
+                if SHEET_NAME_QUOTE_PATTERN.search(sheet_name):
+                    cell_reference = f"'{sheet_name}'!{col_letter}{row_num}"  # クォート付き
+                else:
+                    cell_reference = f"{sheet_name}!{col_letter}{row_num}"  # クォートなし
+                
+                # セルへのジャンプを含むハイパーリンクパス
+                # 形式: file:///path/to/file.xlsx#Sheet1!A1
+                cell_hyperlink_path = f"{hyperlink_path}#{cell_reference}"
+                
+                set_cell_hyperlink(
+                    cell_value_cell,
+                    cell_hyperlink_path,
+                    f"クリックしてセル {cell_reference} にジャンプ: {absolute_file_path}"
+                )
+            else:
+                # ファイルパスが取得できない場合でも、少なくともフォントを設定
+                # （アップロードされたファイルの場合など）
+                cell_value_style = normal_fill_style  # 通常の黒色
+        except Exception as e:
+            # エラーが発生しても処理を継続（ログ出力のみ）
+            app.logger.warning(f"Failed to set cell value hyperlink: {str(e)}")
+        
+        # ファイルパスのセル（7列目）にもハイパーリンクを設定
+        # クリックすると元のExcelファイルが開く
+        try:
+            set_cell_hyperlink(cells[6], hyperlink_path, file_tooltip)
+        except Exception as e:
+            # エラーが発生しても処理を継続（ログ出力のみ）
+            app.logger.warning(f"Failed to set hyperlink for file path {file_path}: {str(e)}")
+        
+        # ====================================================================
+        # 行のスタイルの設定
+        # ====================================================================
+        # ハイパーリンクが設定されているセル（1列目: ファイル名、5列目: セル値、7列目: ファイルパス）は
+        # ハイパーリンクのスタイル（青色、下線付き）、それ以外のセルはキーワードに応じた背景色
+        row_styles = [fill_style] * len(cells)
+        row_styles[4] = cell_value_style
+        for cell, style in zip(cells, row_styles):
+            cell._style = link_style if cell.hyperlink else style
+        
+        ws.append(cells)  # 行を追加
+    
+    return wb
+
+
+# ============================================================================
+# 検索結果ブックの書き出し
+# ============================================================================
+# 検索結果が多い場合、結果ブックの作成と保存に時間がかかるため、
+# 検索結果（JSON）を先に返し、結果ブックはバックグラウンドのスレッドで書き出す
+# ダウンロード時に書き出しが終わっていない場合は、書き出しの完了を待ってから送信する
+
+# 結果ブックをバックグラウンドで書き出すかどうか（RESULTS_BACKGROUND_SAVE=0 で無効化）
+# Vercel環境では、レスポンスを返した後に関数の実行が停止される可能性があるため、同期的に書き出す
+RESULTS_BACKGROUND_SAVE = (
+    not IS_VERCEL
+    and os.environ.get('RESULTS_BACKGROUND_SAVE', '1').lower() in ('true', '1', 'yes')
+)
+
+# 書き出し中の結果ブック（キー: ファイル名、値: Future）
+PENDING_WORKBOOKS = {}
+PENDING_WORKBOOKS_LOCK = threading.Lock()
+
+# 結果ブックを書き出すスレッドプール（最初に使用するときに作成する）
+_results_writer = None
+
+
+def make_results_file_path():
+    """
+    検索結果のExcelファイルの保存先のパスを作成する関数
+    
+    戻り値:
+        Path: RESULTS_FOLDER内の検索結果ファイルのパス
+              （例: search_results_20240101_120000_1a2b3c4d.xlsx）
+    
+    注意:
+        - タイムスタンプは秒単位のため、同じ秒に実行された検索のファイルが
+          同じ名前にならないように、ランダムな識別子を付加します
+        - 作成されたファイルは上書きされないため、同じファイル名のダウンロードは常に同じ内容になります
+    """
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return RESULTS_FOLDER / f'search_results_{timestamp}_{uuid.uuid4().hex[:8]}.xlsx'
+
+
+def save_results_workbook(search_results, keywords, output_file):
+    """
+    検索結果ブックを作成して保存する関数
+    
+    一時ファイルに保存してから置き換えるため、保存中の不完全なファイルが
+    ダウンロードされることはありません。
+    
+    引数:
+        search_results: 検索結果のリスト
+        keywords: 検索に使用したキーワードのリスト
+        output_file: 保存先のパス（Pathオブジェクト）
+    """
+    wb = create_results_workbook(search_results, keywords)
+    # 保存先のファイル名は検索ごとに一意（make_results_file_path）で、上書きされることはないため、
+    # 一時ファイル名も保存先のファイル名から作成するだけで他の検索と重ならない
+    temp_output_file = output_file.with_name(f'{output_file.name}.tmp')
+    try:
+        wb.save(temp_output_file)
+        os.replace(temp_output_file, output_file)
+    except Exception:
+        # 保存に失敗した場合は、一時ファイルを削除
+        try:
+            os.remove(temp_output_file)
+        except OSError:
+            pass
+        raise
+
+
+def write_results_workbook(search_results, keywords, output_file):
+    """
+    検索結果ブックを書き出す関数
+    
+    RESULTS_BACKGROUND_SAVEが有効な場合はバックグラウンドのスレッドで書き出し、
+    無効な場合はその場で書き出します。
+    
+    引数:
+        search_results: 検索結果のリスト（書き出しが終わるまで変更しないこと）
+        keywords: 検索に使用したキーワードのリスト
+        output_file: 保存先のパス（Pathオブジェクト）
+    """
+    global _results_writer
+    
+    if not RESULTS_BACKGROUND_SAVE:
+        save_results_workbook(search_results, keywords, output_file)
+        return
+    
+    with PENDING_WORKBOOKS_LOCK:
+        if _results_writer is None:
+            _results_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='results-writer')
+        future = _results_writer.submit(save_results_workbook, search_results, keywords, output_file)
+        PENDING_WORKBOOKS[output_file.name] = future
+    
+    def on_done(done_future):
+        # 書き出しが終わったら一覧から削除し、エラーが発生した場合はログに記録
+        with PENDING_WORKBOOKS_LOCK:
+            if PENDING_WORKBOOKS.get(output_file.name) is done_future:
+                del PENDING_WORKBOOKS[output_file.name]
+        error = done_future.exception()
+        if error is not None:
+            app.logger.error(f"Error creating workbook {output_file.name}", exc_info=error)
+    
+    future.add_done_callback(on_done)
+
+
+def wait_for_results_workbook(file_name):
+    """
+    結果ブックの書き出しが終わるまで待つ関数
+    
+    引数:
+        file_name: 結果ブックのファイル名
+    
+    注意:
+        - 書き出し中でない場合（書き出し済み、または存在しない場合）はすぐに戻ります
+        - 書き出しに失敗した場合でも例外は発生しません（ファイルが存在しないものとして扱う）
+    """
+    with PENDING_WORKBOOKS_LOCK:
+        future = PENDING_WORKBOOKS.get(file_name)
+    if future is not None:
+        try:
+            future.result()
+        except Exception:
+            pass  # エラーは書き出し時にログに記録されている
+
+
+def normalize_path(path_str):
+    """
+    パス文字列を正規化する関数
+    
+    異なる形式で入力されたパス（相対パス、絶対パス、Windows形式、Unix形式など）を
+    統一された形式に変換します。これにより、異なる環境や入力方法からの
+    パスを正しく処理できるようになります。
+    
+    引数:
+        path_str: 正規化するパス文字列
+    
+    戻り値:
+        Path: 正規化されたPathオブジェクト。無効な場合はNone
+    
+    処理内容:
+        1. 前後の空白を削除
+        2. Pathオブジェクトに変換
+        3. 存在する場合は絶対パスに解決
+        4. 存在しない場合でも可能な限り絶対パスに変換を試みる
+    
+    使用例:
+        normalize_path("C:\\Users\\Documents") -> Path("C:/Users/Documents")
+        normalize_path("../folder") -> Path("/absolute/path/to/folder")
+    """
+    if not path_str:
+        return None
+    
+    # 文字列の前後の空白を削除
+    path_str = path_str.strip()
+    
+    # 空文字列の場合はNoneを返す
+    if not path_str:
+        return None
+    
+    # パスを正規化（Pathオブジェクトを使用）
+    try:
+        # まずPathオブジェクトに変換
+        # Pathオブジェクトは、WindowsとUnixの両方のパス形式を自動的に処理
+        path_obj = Path(path_str)
+        
+        # 絶対パスに変換（存在する場合）
+        if path_obj.exists():
+            # ファイル/フォルダが存在する場合は、絶対パスに解決
+            path_obj = path_obj.resolve()
+        else:
+            # 存在しない場合でも、絶対パスに変換を試みる
+            # これにより、相対パスを絶対パスに変換できる
+            try:
+                path_obj = path_obj.resolve()
+            except (OSError, RuntimeError):
+                # 解決できない場合は、元のパスを使用
+                # 例: 存在しないパスや、無効なパス形式の場合
+                pass
+        
+        return path_obj
+    except Exception as e:
+        # エラーが発生した場合は警告をログに記録
+        app.logger.warning(f"Path normalization error for '{path_str}': {str(e)}")
+        # エラーが発生した場合でも、元のパスをPathオブジェクトとして返す
+        # これにより、処理を継続できる
+        return Path(path_str)
+
+
+def list_files_with_extensions(folder, extensions, recursive=False):
+    """
+    フォルダ内の指定された拡張子のファイルを取得する関数
+    
+    os.scandir（サブフォルダも含める場合はos.walk）でフォルダを1回だけ走査し、
+    ファイル名の末尾で拡張子を判定します。拡張子ごとにglobでフォルダを走査するより高速です。
+    
+    引数:
+        folder: 検索するフォルダのパス（Pathオブジェクトまたは文字列）
+        extensions: 拡張子のリスト（例: ['.xlsx', '.xls']）
+        recursive: Trueの場合はサブフォルダも検索する
+    
+    戻り値:
+        list: 見つかったファイルのPathオブジェクトのリスト（パスの順に並べたもの）
+    
+    注意:
+        - 拡張子の大文字小文字の扱いはglobと同じです（Windowsでは区別しない、それ以外では区別する）
+    """
+    # os.path.normcaseはWindowsでのみ小文字に変換する（globと同じ大文字小文字の扱いにする）
+    suffixes = tuple(os.path.normcase(ext) for ext in extensions)
+    if not suffixes:
+        return []
+    
+    file_paths = []
+    if recursive:
+        for dir_path, _, file_names in os.walk(folder):
+            for file_name in file_names:
+                if os.path.normcase(file_name).endswith(suffixes):
+                    file_paths.append(os.path.join(dir_path, file_name))
+    else:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                # DirEntryはファイルの種類をキャッシュしているため、is_fileで追加のstatは発生しない
+                if os.path.normcase(entry.name).endswith(suffixes) and entry.is_file():
+                    file_paths.append(entry.path)
+    
+    file_paths.sort()
+    return [Path(file_path) for file_path in file_paths]
+
+
+# 検索・置換のパターンをキャッシュしておく数
+SEARCH_PATTERN_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=SEARCH_PATTERN_CACHE_SIZE)
+def compile_search_pattern(search_pattern, use_regex):
+    """
+    検索・置換の検索パターンをコンパイルする関数（結果はキャッシュされる）
+    
+    同じパターンで検索・置換を繰り返す場合（プレビューの後に置換を実行する場合など）に、
+    パターンの変換やコンパイルを繰り返さないようにします。
+    
+    引数:
+        search_pattern: 検索パターン
+        use_regex: Trueの場合は正規表現として、Falseの場合は通常の文字列として扱う
+    
+    戻り値:
+        re.Pattern: コンパイルした検索パターン（スレッド間で共有しても安全）
+    
+    例外:
+        re.error: 正規表現が正しくない場合（この場合はキャッシュされない）
+    """
+    if use_regex:
+        return re.compile(search_pattern)
+    # 通常の文字列検索（エスケープ処理）
+    return re.compile(re.escape(search_pattern))
+
+
+def extract_required_literal(search_pattern, use_regex):
+    """
+    検索パターンにマッチする文字列に必ず含まれる文字列（リテラル）を取得する関数
+    
+    リテラルを含まないセルや行は、正規表現で検索しなくてもマッチしないことが分かるため、
+    正規表現の検索の前に文字列の検索（in）で除外できます。
+    
+    引数:
+        search_pattern: 検索パターン
+        use_regex: Trueの場合は正規表現として、Falseの場合は通常の文字列として扱う
+    
+    戻り値:
+        str: 必ず含まれる文字列のうち最も長いもの（取得できない場合はNone）
+    
+    注意:
+        - 正規表現の場合は、パターンの先頭の階層で連続する通常の文字だけを対象とします
+          （グループ内、選択（|）、繰り返しなどは対象外）
+        - 大文字小文字を区別しない指定（(?i)）がある場合はNoneを返します
+    """
+    if not use_regex:
+        return search_pattern
+    
+    try:
+        parsed = sre_parse.parse(search_pattern)
+    except Exception:
+        return None  # 構文解析できない場合は、除外せずに正規表現で検索する
+    
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+    
+    # 先頭の階層で連続する通常の文字（LITERAL）をまとめ、最も長いものを選ぶ
+    longest_literal = ''
+    current_literal = []
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL:
+            current_literal.append(chr(arg))
+            continue
+        if len(current_literal) > len(longest_literal):
+            longest_literal = ''.join(current_literal)
+        current_literal = []
+    if len(current_literal) > len(longest_literal):
+        longest_literal = ''.join(current_literal)
+    
+    return longest_literal or None
+
+
+# 検索・置換でマッチした箇所のレコード（1つのマッチを表す）
+# マッチ数が多い場合でもメモリ使用量やプロセス間の受け渡しのコストを抑えるため、辞書ではなくnamedtupleを使用
+#   line: 行番号（Excelの場合はセルの行番号）
+#   start, end: マッチの開始・終了位置（テキストファイルの場合はファイルの先頭から、Excelの場合はセルの値の先頭から）
+#   match_text: マッチしたテキスト
+#   line_content: 行の内容（Excelの場合はセルの値）
+#   context_before, context_after: マッチの前後のテキスト（最大50文字）
+#   sheet, column: シート名と列文字（Excelの場合のみ）
+# JSONで返す場合はreplace_matches_to_jsonで変換する
+TextReplaceMatch = namedtuple('TextReplaceMatch', [
+    'line', 'start', 'end', 'match_text', 'line_content', 'context_before', 'context_after'
+])
+ExcelReplaceMatch = namedtuple('ExcelReplaceMatch', TextReplaceMatch._fields + ('sheet', 'column'))
+
+
+def copy_backup_file(source_path, backup_path):
+    """
+    置換前のファイルのバックアップを作成する関数（shutil.copy2と同じく、更新日時などの情報もコピーする）
+    
+    os.copy_file_rangeが利用できる場合（Linux）は、ファイルの内容をカーネル内でコピーします。
+    コピーオンライトに対応したファイルシステム（Btrfs、XFSなど）では、データを複製せずに
+    バックアップを作成できるため、大きなファイルでも高速です。
+    
+    引数:
+        source_path: コピー元のファイルのパス
+        backup_path: バックアップファイルのパス（既に存在する場合は上書きする）
+    
+    注意:
+        - os.copy_file_rangeが利用できない場合や失敗した場合は、shutil.copy2でコピーします
+    """
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(source_path, 'rb') as source_file, open(backup_path, 'wb') as backup_file:
+                remaining = os.fstat(source_file.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(source_file.fileno(), backup_file.fileno(), remaining)
+                    if copied == 0:
+                        break  # ファイルシステムによっては途中で0を返す場合がある
+                    remaining -= copied
+            if remaining == 0:
+                shutil.copystat(source_path, backup_path)
+                return
+        except OSError:
+            pass  # 異なるファイルシステム間のコピーなど、対応していない場合
+    
+    shutil.copy2(source_path, backup_path)
+
+
+def replace_matches_to_json(matches, columns=False):
+    """
+    検索・置換でマッチした箇所のリストを、JSONで返す形式に変換する関数
+    
+    引数:
+        matches: TextReplaceMatchまたはExcelReplaceMatchのリスト（1つのファイルの分）
+        columns: Trueの場合は、項目ごとの値のリストをまとめた辞書に変換する
+                 （例: {"line": [1, 2], "start": [0, 5], ...}、マッチ数が多い場合にJSONが小さくなる）
+    
+    戻り値:
+        list または dict: columnsがFalseの場合はマッチごとの辞書のリスト、Trueの場合は項目ごとのリストの辞書
+    """
+    if not columns:
+        return [match._asdict() for match in matches]
+    if not matches:
+        return {}
+    return {field: list(values) for field, values in zip(matches[0]._fields, zip(*matches))}
+
+
+class LiteralMatch:
+    """
+    通常の文字列検索（正規表現を使用しない検索）でマッチした箇所
+    
+    検索・置換の処理で使用するre.Matchのメソッド（start、end、group）のみを持ちます。
+    """
+    
+    __slots__ = ('_start', '_end', '_text')
+    
+    def __init__(self, start, end, text):
+        self._start = start
+        self._end = end
+        self._text = text
+    
+    def start(self):
+        return self._start
+    
+    def end(self):
+        return self._end
+    
+    def group(self):
+        return self._text
+
+
+def iter_literal_matches(text, literal):
+    """
+    文字列に含まれる検索文字列を、正規表現を使用せずにstr.findで順に探すジェネレータ
+    
+    正規表現のfinditerは呼び出しごとに検索の状態を作成するため、1つのセルの値のような短い文字列を
+    数多く検索する場合は、str.findを繰り返す方が高速です。
+    
+    引数:
+        text: 検索対象の文字列
+        literal: 検索文字列（空文字列は不可）
+    
+    戻り値:
+        generator: LiteralMatch（先頭から順、重ならない。str.replaceが置換する箇所と同じ）
+    """
+    literal_length = len(literal)
+    start = text.find(literal)
+    while start != -1:
+        end = start + literal_length
+        yield LiteralMatch(start, end, literal)
+        start = text.find(literal, end)
+
+
+def find_regex_matches(pattern, text):
+    """
+    文字列に含まれる正規表現のマッチを、先頭から順にすべて探す関数
+    
+    マッチしない文字列（検索対象の大半のセル）では、finditerの結果からリストを作らずに
+    pattern.searchの1回の検索だけで済ませます。
+    
+    引数:
+        pattern: コンパイルした検索パターン
+        text: 検索対象の文字列
+    
+    戻り値:
+        list: re.Matchのリスト（list(pattern.finditer(text))と同じ）
+    """
+    first_match = pattern.search(text)
+    if first_match is None:
+        return []
+    
+    # 空文字列にマッチした場合は、同じ位置から続けて検索すると同じマッチが再度見つかるため、
+    # 先頭から検索し直す
+    if first_match.end() == first_match.start():
+        return list(pattern.finditer(text))
+    
+    # 最初のマッチの終了位置から続けて検索する
+    # （posを指定した検索では、終了位置より前の文字も後読みや\bの判定に使われる）
+    return [first_match, *pattern.finditer(text, first_match.end())]
+
+
+def apply_replacements(text, matches, replace_pattern, use_regex):
+    """
+    検索で見つかったマッチの位置を使って、置換後の文字列を組み立てる関数
+    
+    re.subやstr.replaceで文字列全体を検索し直さずに、マッチの間の文字列と置換後の文字列をつなげます。
+    
+    引数:
+        text: 置換前の文字列
+        matches: textに対するfind_regex_matchesまたはiter_literal_matchesの結果のリスト（先頭から順）
+        replace_pattern: 置換パターン
+        use_regex: Trueの場合は正規表現の置換パターンとして扱う（\\1や\\g<name>を展開する）
+    
+    戻り値:
+        str: 置換後の文字列（re.subやstr.replaceと同じ結果）
+    """
+    # 正規表現の置換パターンでも、バックスラッシュを含まない場合は展開せずにそのまま使える
+    expand_template = use_regex and '\\' in replace_pattern
+    
+    parts = []
+    last_end = 0
+    for match in matches:
+        parts.append(text[last_end:match.start()])
+        parts.append(match.expand(replace_pattern) if expand_template else replace_pattern)
+        last_end = match.end()
+    parts.append(text[last_end:])
+    return ''.join(parts)
+
+
+def search_replace_file(file_path, search_pattern, replace_pattern, use_regex, preview_only, max_matches=None):
+    """
+    1つのファイルに対して検索・置換を実行する関数
+    
+    一括検索・置換（/api/search-replace）で、ファイルごとに呼び出されます。
+    複数のプロセスで並列に実行されるため、各ファイルは1つのプロセスだけが読み書きします。
+    
+    引数:
+        file_path: 対象ファイルのパス（Pathオブジェクト）
+        search_pattern: 検索パターン
+        replace_pattern: 置換パターン
+        use_regex: Trueの場合は正規表現として、Falseの場合は通常の文字列として扱う
+        preview_only: Trueの場合は検索のみ行い、置換しない
+        max_matches: 結果に記録するマッチ数の上限（Noneの場合は上限なし）
+    
+    戻り値:
+        tuple: (結果のリスト, 置換数)
+               結果のリストは、マッチした場合またはエラーの場合に1件、それ以外は空
+    
+    注意:
+        - 例外は発生させず、エラーは結果のリストに記録します
+        - 上限を超えたマッチは記録せず、結果に'truncated': Trueを設定します
+          （マッチ数の集計と置換は、上限に関わらずすべてのマッチに対して行います）
+    """
+    results = []
+    total_replacements = 0
+    
+    # マッチを探す関数（find_matchesはリストを、iter_matchesは順にマッチを返す）
+    # 正規表現を使用しない場合は、正規表現ではなくstr.findで探す
+    if use_regex:
+        # 検索パターン（プロセスごとにキャッシュされる）
+        pattern = compile_search_pattern(search_pattern, use_regex)
+        find_matches = functools.partial(find_regex_matches, pattern)
+        iter_matches = pattern.finditer
+    else:
+        iter_matches = functools.partial(iter_literal_matches, literal=search_pattern)
+        
+        def find_matches(text):
+            return list(iter_literal_matches(text, search_pattern))
+    
+    # マッチする文字列に必ず含まれる文字列（含まない値は正規表現で検索せずに除外する）
+    required_literal = extract_required_literal(search_pattern, use_regex)
+    
+    try:
+        # Excelファイルかどうかを判定
+        is_excel = file_path.suffix.lower() in ['.xlsx', '.xls']
+        
+        if is_excel:
+            # Excelファイルの処理
+            try:
+                file_result = {
+                    'file_path': str(file_path),
+                    'file_name': file_path.name,
+                    'matches': [],
+                    'total_matches': 0,
+                    'replaced': False
+                }
                 
-                # 列番号をExcelの列文字（A, B, C...）に変換する内部関数
-                # 例: 1 -> A, 2 -> B, 27 -> AA
-                def number_to_excel_column(n):
-                    """
-                    数値をExcelの列文字に変換する関数
-                    
-                    引数:
-                        n: 列番号（1から始まる）
+                # 置換するセルの一覧（シート名、行番号、列番号、置換後の値）
+                cell_replacements = []
+                
+                # マッチする文字列に必ず含まれる文字列が共有文字列にない場合は、どのセルにもマッチしない
+                # （.xlsxファイルのZIPの中の共有文字列のXMLだけを確認し、ワークブックを開かずに除外する）
+                if required_literal and not excel_file_may_contain_keywords(str(file_path), [required_literal]):
+                    return results, total_replacements
+                
+                # 1回目: 読み取り専用モードで開き、マッチするセルを探す
+                # 読み取り専用モードはセルオブジェクトやスタイルを生成せずに行の値を順に読み込むため、
+                # メモリ使用量が少なく高速（プレビューやマッチしないファイルでは、通常モードで開かずに済む）
+                wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+                try:
+                    # 各シートを処理
+                    for sheet_name in wb.sheetnames:
+                        ws = wb[sheet_name]
+                        
+                        # シートのサイズ情報が正しくない（A1:A1）場合は、実際のデータをすべて読み込む
+                        try:
+                            if ws.calculate_dimension() == 'A1:A1':
+                                ws.reset_dimensions()
+                        except ValueError:
+                            pass  # サイズ情報がない場合は、そのまま全データを読み込める
+                        
+                        # 各セルを走査（values_only=Trueでセルの値のみを取得）
+                        # データが存在する範囲の左上から読み込み、先頭の空の行や列を生成しない
+                        min_row = ws.min_row
+                        min_col = ws.min_column
+                        for row_idx, row_values in enumerate(
+                            ws.iter_rows(min_row=min_row, min_col=min_col, values_only=True), start=min_row
+                        ):
+                            for col_idx, value in enumerate(row_values, start=min_col):
+                                if value is None:
+                                    continue
+                                
+                                # セルの値を文字列に変換
+                                cell_value = str(value)
+                                
+                                # 必ず含まれる文字列を含まないセルは、正規表現で検索せずにスキップ
+                                if required_literal and required_literal not in cell_value:
+                                    continue
+                                
+                                # 検索実行
+                                matches = find_matches(cell_value)
+                                
+                                if matches:
+                                    column_letter = column_number_to_letter(col_idx)
+                                    for match in matches:
+                                        file_result['total_matches'] += 1
+                                        
+                                        # 記録するマッチ数の上限に達した場合は、件数のみ数える
+                                        if max_matches is not None and len(file_result['matches']) >= max_matches:
+                                            file_result['truncated'] = True
+                                            continue
+                                        
+                                        file_result['matches'].append(ExcelReplaceMatch(
+                                            row_idx,
+                                            match.start(),
+                                            match.end(),
+                                            match.group(),
+                                            cell_value,
+                                            cell_value[max(0, match.start()-50):match.start()],
+                                            cell_value[match.end():min(len(cell_value), match.end()+50)],
+                                            sheet_name,
+                                            column_letter
+                                        ))
+                                    
+                                    # 置換後の値を記録（プレビューモードでない場合）
+                                    # 見つかったマッチの位置を使うため、セルの値を検索し直さない
+                                    if not preview_only:
+                                        new_value = apply_replacements(cell_value, matches, replace_pattern, use_regex)
+                                        cell_replacements.append((sheet_name, row_idx, col_idx, new_value))
+                                        total_replacements += len(matches)
+                finally:
+                    # 読み取り専用モードではファイルを開いたままにするため、必ず閉じる
+                    wb.close()
+                
+                # 2回目: 置換するセルがある場合のみ、通常モードで開いて置換し、保存する
+                if cell_replacements:
+                    # バックアップを作成（置換実行前）
+                    backup_path = file_path.with_suffix(file_path.suffix + '.bak')
+                    copy_backup_file(file_path, backup_path)
+                    file_result['backup_path'] = str(backup_path)
                     
-                    戻り値:
-                        str: Excelの列文字（A, B, C, ..., Z, AA, AB, ...）
+                    wb = openpyxl.load_workbook(file_path, data_only=True)
+                    for sheet_name, row_idx, col_idx, new_value in cell_replacements:
+                        # セルに新しい値を設定
+                        wb[sheet_name].cell(row=row_idx, column=col_idx).value = new_value
                     
-                    アルゴリズム:
-                        26進数のように変換（ただし、1から始まる）
-                    """
-                    result_col = ""
-                    while n > 0:
-                        n -= 1  # 0ベースに変換
-                        result_col = chr(65 + (n % 26)) + result_col  # A=65, B=66, ...
-                        n //= 26  # 次の桁へ
-                    return result_col
+                    # Excelファイルを保存
+                    wb.save(file_path)
+                    file_result['replaced'] = True
                 
-                col_letter = number_to_excel_column(col_num)  # 列番号を列文字に変換
+                # 結果が1つでもあれば追加
+                if file_result['total_matches'] > 0:
+                    results.append(file_result)
                 
-                # シート名に特殊文字が含まれている場合はシングルクォートで囲む
-                # Excelのセル参照では、特殊文字を含むシート名はクォートで囲む必要がある
-                if ' ' in sheet_name or '-' in sheet_name or any(c in sheet_name for c in ['!', '@', '#', '$', '%', '^', '&', '*', '(', ')']):
-                    cell_reference = f"'{sheet_name}'!{col_letter}{row_num}"  # クォート付き
+            except Exception as excel_error:
+                results.append({
+                    'file_path': str(file_path),
+                    'file_name': file_path.name,
+                    'error': f'Excelファイル処理エラー: {str(excel_error)}',
+                    'matches': [],
+                    'total_matches': 0
+                })
+        else:
+            # テキストファイルの処理（既存の処理）
+            # 文字列に変換する前に、バイト列のまま読み込む
+            with open(file_path, 'rb') as f:
+                raw_content = f.read()
+            
+            # ASCII文字だけのファイルは、必ず含まれる文字列をバイト列のまま探せる
+            # （含まないファイルは、文字列への変換も正規表現での検索もせずに除外する）
+            # 注意: 改行を含む文字列は、改行コードの変換（\r\n → \n）の後でないと判定できない
+            if (required_literal and '\n' not in required_literal and raw_content.isascii()
+                    and required_literal.encode('utf-8') not in raw_content):
+                matches = []
+                match_count = 0
+            else:
+                # テキストモード（encoding='utf-8', errors='ignore'）で読み込んだ場合と同じ文字列に変換する
+                # （改行コード\r\nと\rは\nに変換する）
+                content = raw_content.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+                
+                # 検索実行（必ず含まれる文字列を含まないファイルは、正規表現で検索しない）
+                if required_literal and required_literal not in content:
+                    matches = []
+                    match_count = 0
+                elif preview_only and max_matches is not None:
+                    # プレビューではマッチを置換に使わないため、記録する上限までのマッチだけを保持し、
+                    # 残りのマッチは数えるだけにする（マッチの多いファイルでもメモリ使用量が増えない）
+                    match_iter = iter_matches(content)
+                    matches = list(islice(match_iter, max_matches))
+                    match_count = len(matches) + sum(1 for _ in match_iter)
                 else:
-                    cell_reference = f"{sheet_name}!{col_letter}{row_num}"  # クォートなし
+                    matches = find_matches(content)
+                    match_count = len(matches)
+            
+            if match_count:
+                file_result = {
+                    'file_path': str(file_path),
+                    'file_name': file_path.name,
+                    'matches': [],
+                    'total_matches': match_count,
+                    'replaced': False
+                }
                 
-                # セルへのジャンプを含むハイパーリンクパス
-                # 形式: file:///path/to/file.xlsx#Sheet1!A1
-                cell_hyperlink_path = f"{hyperlink_path}#{cell_reference}"
+                # 記録するマッチ数の上限を超える場合は、先頭から上限までのマッチのみ記録する
+                recorded_matches = matches
+                if max_matches is not None and match_count > max_matches:
+                    recorded_matches = matches[:max_matches]
+                    file_result['truncated'] = True
                 
-                if HYPERLINK_AVAILABLE:
-                    try:
-                        cell_value_cell.hyperlink = Hyperlink(
-                            target=cell_hyperlink_path,
-                            tooltip=f"クリックしてセル {cell_reference} にジャンプ: {absolute_file_path}"
-                        )
-                    except (TypeError, AttributeError):
-                        try:
-                            cell_value_cell.hyperlink = Hyperlink(target=cell_hyperlink_path)
-                        except Exception:
-                            cell_value_cell.hyperlink = cell_hyperlink_path
-                else:
-                    cell_value_cell.hyperlink = cell_hyperlink_path
+                # 各マッチの情報を取得
+                # マッチは先頭から順に返されるため、行番号は前のマッチからの改行の数だけ進める
+                # （マッチごとにファイルの先頭から改行を数え直さない）
+                line_number = 1
+                counted_pos = 0
+                for match in recorded_matches:
+                    start_pos = match.start()
+                    end_pos = match.end()
+                    
+                    # 該当行を取得
+                    line_number += content.count('\n', counted_pos, start_pos)
+                    counted_pos = start_pos
+                    line_start = content.rfind('\n', 0, start_pos) + 1
+                    line_end = content.find('\n', end_pos)
+                    if line_end == -1:
+                        line_end = len(content)
+                    line_content = content[line_start:line_end]
+                    
+                    file_result['matches'].append(TextReplaceMatch(
+                        line_number,
+                        start_pos,
+                        end_pos,
+                        match.group(),
+                        line_content,
+                        content[max(0, start_pos-50):start_pos],
+                        content[end_pos:min(len(content), end_pos+50)]
+                    ))
                 
-                # ハイパーリンクのスタイル設定（青色、下線付き）
-                cell_value_cell.font = Font(color="0563C1", underline="single")
-            else:
-                # ファイルパスが取得できない場合でも、少なくともフォントを設定
-                # （アップロードされたファイルの場合など）
-                cell_value_cell.font = Font(color="000000")  # 通常の黒色
-        except Exception as e:
-            # エラーが発生しても処理を継続（ログ出力のみ）
-            try:
-                import logging
-                logging.warning(f"Failed to set cell value hyperlink: {str(e)}")
-            except:
-                pass
-        
-        # ファイルパスのセル（7列目）にもハイパーリンクを設定
-        # クリックすると元のExcelファイルが開く
-        file_path_cell = ws.cell(row=current_row, column=7)
-        try:
-            if HYPERLINK_AVAILABLE:
-                # Hyperlinkオブジェクトを使用してハイパーリンクとツールチップを設定
-                try:
-                    file_path_cell.hyperlink = Hyperlink(
-                        target=hyperlink_path,
-                        tooltip=f"クリックしてファイルを開く: {absolute_file_path}"
-                    )
-                except (TypeError, AttributeError):
-                    # 古いバージョンのopenpyxlではtooltipパラメータがない場合がある
-                    try:
-                        file_path_cell.hyperlink = Hyperlink(target=hyperlink_path)
-                    except Exception:
-                        # Hyperlinkオブジェクトの作成に失敗した場合は文字列を直接設定
-                        file_path_cell.hyperlink = hyperlink_path
-            else:
-                # Hyperlinkクラスが利用できない場合は文字列を直接設定
-                file_path_cell.hyperlink = hyperlink_path
+                # 置換実行（プレビューモードでない場合）
+                if not preview_only:
+                    # バックアップを作成
+                    backup_path = file_path.with_suffix(file_path.suffix + '.bak')
+                    copy_backup_file(file_path, backup_path)
+                    
+                    # 置換実行（見つかったマッチの位置を使うため、ファイルの内容を検索し直さない）
+                    new_content = apply_replacements(content, matches, replace_pattern, use_regex)
+                    
+                    # ファイルに書き込み
+                    with open(file_path, 'w', encoding='utf-8') as f:
+                        f.write(new_content)
+                    
+                    file_result['replaced'] = True
+                    file_result['backup_path'] = str(backup_path)
+                    total_replacements += len(matches)
+                
+                results.append(file_result)
             
-            # ハイパーリンクのスタイル設定（青色、下線付き）
-            file_path_cell.font = Font(color="0563C1", underline="single")
-        except Exception as e:
-            # エラーが発生しても処理を継続（ログ出力のみ）
-            try:
-                import logging
-                logging.warning(f"Failed to set hyperlink for file path {file_path}: {str(e)}")
-            except:
-                pass
-        
-        # ====================================================================
-        # 行の色分け（キーワードに応じて）
-        # ====================================================================
-        # 各キーワードに異なる色を割り当てて、検索結果を見やすくする
-        keyword_colors = {
-            keywords[0]: "FFE6E6" if len(keywords) > 0 else "FFFFFF",  # 1番目のキーワード: 薄い赤
-            keywords[1]: "E6F3FF" if len(keywords) > 1 else "FFFFFF",  # 2番目のキーワード: 薄い青
-            keywords[2]: "E6FFE6" if len(keywords) > 2 else "FFFFFF",  # 3番目のキーワード: 薄い緑
-        }
-        # マッチしたキーワードに対応する色を取得（デフォルトは白）
-        fill_color = keyword_colors.get(result['keyword'], "FFFFFF")
-        fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
-        
-        # 行の各セルに背景色を設定
-        for col in range(1, len(row) + 1):
-            cell = ws.cell(row=current_row, column=col)
-            # ハイパーリンクが設定されているセル（1列目: ファイル名、5列目: セル値、7列目: ファイルパス）の
-            # フォント色は保持（背景色のみ設定）
-            if col not in [1, 5, 7] or not cell.hyperlink:
-                cell.fill = fill
-    
-    # ========================================================================
-    # 列幅の自動調整
-    # ========================================================================
-    # 各列の内容に応じて列幅を自動調整し、見やすくする
-    for col in ws.columns:
-        max_length = 0
-        col_letter = col[0].column_letter  # 列文字（A, B, C, ...）を取得
-        
-        # 列内の各セルの最大文字数を取得
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass  # エラーが発生した場合はスキップ
-        
-        # 列幅を調整（最大50文字まで、最小2文字の余白を追加）
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[col_letter].width = adjusted_width
+    except Exception as e:
+        results.append({
+            'file_path': str(file_path),
+            'file_name': file_path.name,
+            'error': str(e),
+            'matches': [],
+            'total_matches': 0
+        })
     
-    return wb
+    return results, total_replacements
 
 
-def normalize_path(path_str):
+# セル詳細表示用にキャッシュしておくシート（セルの値の一覧）の数
+# 検索結果の複数のセルを続けて表示する場合に、同じシートを毎回読み込み直さないようにする
+CELL_DETAILS_SHEET_CACHE_SIZE = 8
+
+# セル詳細表示用のシートをキャッシュするファイルの最大サイズ（バイト）
+# これより大きいファイルは、キャッシュに大量のメモリを使用しないように毎回読み込む
+CELL_DETAILS_CACHE_MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+
+
+def read_cell_details_sheet(file_path_str, sheet_name):
     """
-    パス文字列を正規化する関数
-    
-    異なる形式で入力されたパス（相対パス、絶対パス、Windows形式、Unix形式など）を
-    統一された形式に変換します。これにより、異なる環境や入力方法からの
-    パスを正しく処理できるようになります。
+    セル詳細表示用に、シートのセルの値を読み込む関数
     
     引数:
-        path_str: 正規化するパス文字列
+        file_path_str: Excelファイルのパス（文字列）
+        sheet_name: シート名
     
     戻り値:
-        Path: 正規化されたPathオブジェクト。無効な場合はNone
+        tuple: 行ごとのセルの値のタプルのタプル（すべての行は同じ列数）
+               シートが見つからない場合はNone
     
-    処理内容:
-        1. 前後の空白を削除
-        2. Pathオブジェクトに変換
-        3. 存在する場合は絶対パスに解決
-        4. 存在しない場合でも可能な限り絶対パスに変換を試みる
+    注意:
+        - 読み取り専用モードで読み込み、ワークブック全体（セルオブジェクト・スタイル）は保持しません
+        - 値のみのタプルを返すため、複数のリクエストで共有しても排他制御は不要です
+    """
+    wb = openpyxl.load_workbook(file_path_str, read_only=True, data_only=True, keep_links=False)
+    try:
+        if sheet_name not in wb.sheetnames:
+            return None
+        sheet = wb[sheet_name]
+        # ファイルに記録されたシートの範囲（dimension）は正しくない場合があるため、
+        # 実際のセルから範囲を求める
+        sheet.reset_dimensions()
+        rows = [tuple(row_values) for row_values in sheet.iter_rows(values_only=True)]
+    finally:
+        wb.close()
     
-    使用例:
-        normalize_path("C:\\Users\\Documents") -> Path("C:/Users/Documents")
-        normalize_path("../folder") -> Path("/absolute/path/to/folder")
+    # セルのない末尾の行（行の高さの指定のみなど）はシートの範囲に含めない
+    while rows and not rows[-1]:
+        rows.pop()
+    if not rows:
+        return ((None,),)  # 空のシート（openpyxlと同様に1行1列として扱う）
+    
+    # すべての行を最大の列数に揃える
+    max_col = max(len(row_values) for row_values in rows)
+    return tuple(row_values + (None,) * (max_col - len(row_values)) for row_values in rows)
+
+
+@functools.lru_cache(maxsize=CELL_DETAILS_SHEET_CACHE_SIZE)
+def load_cell_details_sheet(file_path_str, mtime_ns, file_size, sheet_name):
     """
-    if not path_str:
-        return None
+    セル詳細表示用に、シートのセルの値を読み込む関数（結果はキャッシュされる）
     
-    # 文字列の前後の空白を削除
-    path_str = path_str.strip()
+    引数:
+        file_path_str: Excelファイルのパス（文字列）
+        mtime_ns: ファイルの更新日時（ナノ秒、キャッシュのキーとしてのみ使用）
+        file_size: ファイルサイズ（キャッシュのキーとしてのみ使用）
+        sheet_name: シート名
     
-    # 空文字列の場合はNoneを返す
-    if not path_str:
-        return None
+    戻り値:
+        tuple: read_cell_details_sheetと同じ
     
-    # パスを正規化（Pathオブジェクトを使用）
-    try:
-        # まずPathオブジェクトに変換
-        # Pathオブジェクトは、WindowsとUnixの両方のパス形式を自動的に処理
-        path_obj = Path(path_str)
-        
-        # 絶対パスに変換（存在する場合）
-        if path_obj.exists():
-            # ファイル/フォルダが存在する場合は、絶対パスに解決
-            path_obj = path_obj.resolve()
-        else:
-            # 存在しない場合でも、絶対パスに変換を試みる
-            # これにより、相対パスを絶対パスに変換できる
-            try:
-                path_obj = path_obj.resolve()
-            except (OSError, RuntimeError):
-                # 解決できない場合は、元のパスを使用
-                # 例: 存在しないパスや、無効なパス形式の場合
-                pass
-        
-        return path_obj
-    except Exception as e:
-        # エラーが発生した場合は警告をログに記録
-        app.logger.warning(f"Path normalization error for '{path_str}': {str(e)}")
-        # エラーが発生した場合でも、元のパスをPathオブジェクトとして返す
-        # これにより、処理を継続できる
-        return Path(path_str)
+    注意:
+        - ファイルが変更された場合は更新日時・サイズが変わるため、読み込み直されます
+        - CELL_DETAILS_CACHE_MAX_FILE_SIZEより大きいファイルには使用しないでください
+    """
+    return read_cell_details_sheet(file_path_str, sheet_name)
 
 
 # ============================================================================
@@ -557,7 +2370,8 @@ def search_excel_files():
         Content-Type: application/json
         Body: {
             "folder_path": "C:\\Users\\Documents\\ExcelFiles",
-            "keywords": ["キーワード1", "キーワード2", ...]
+            "keywords": ["キーワード1", "キーワード2", ...],
+            "first_match_only": false  // セルごとに最初にマッチしたキーワードだけを返すか（オプション）
         }
     
     レスポンス:
@@ -606,6 +2420,7 @@ def search_excel_files():
         
         folder_path = data.get('folder_path', '')
         keywords = data.get('keywords', [])
+        first_match_only = bool(data.get('first_match_only', False))
         
         if not folder_path:
             return jsonify({'success': False, 'error': 'フォルダパスが指定されていません'}), 400
@@ -656,7 +2471,7 @@ def search_excel_files():
             }), 400
         
         # Excelファイルを検索
-        excel_files = list(folder.glob('*.xlsx')) + list(folder.glob('*.xls'))
+        excel_files = list_files_with_extensions(folder, ['.xlsx', '.xls'])
         
         app.logger.info(f"Found {len(excel_files)} Excel files in folder: {folder}")
         
@@ -682,24 +2497,18 @@ def search_excel_files():
                 'files_in_folder': file_list
             }), 404
         
-        # 各ファイルを検索
+        # 各ファイルを検索（複数ファイルは並列に検索）
+        # ファイルごとのエラーはsearch_keywords_in_excel内で処理され、空のリストが返される
         all_results = []
-        for excel_file in excel_files:
-            try:
-                results = search_keywords_in_excel(excel_file, keywords)
-                all_results.extend(results)
-            except Exception as e:
-                print(f"Error processing {excel_file}: {str(e)}")
-                continue
+        for results in search_keywords_in_excel_files(excel_files, keywords, first_match_only):
+            all_results.extend(results)
         
         # 結果をExcelブックに出力
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_file = RESULTS_FOLDER / f'search_results_{timestamp}.xlsx'
-            wb = create_results_workbook(all_results, keywords)
-            wb.save(output_file)
-        except Exception as e:
-            print(f"Error creating workbook: {str(e)}")
+            output_file = make_results_file_path()
+            write_results_workbook(all_results, keywords, output_file)
+        except Exception:
+            app.logger.exception("Error creating workbook")
             # ブック作成に失敗しても検索結果は返す
         
         # 結果をJSON形式で返す
@@ -716,17 +2525,14 @@ def search_excel_files():
         
         return jsonify({
             'success': True,
-            'results': all_results,
+            'results': [result._asdict() for result in all_results],  # JSONで返すため辞書に変換
             'total_matches': len(all_results),
             'files_searched': len(excel_files),
             'output_file': output_file_str
         })
         
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"Error in search_excel_files: {error_trace}")
-        app.logger.error(f"Error in search_excel_files: {error_trace}")
+        app.logger.exception("Error in search_excel_files")
         response = jsonify({
             'success': False,
             'error': f'検索中にエラーが発生しました: {str(e)}'
@@ -750,6 +2556,7 @@ def search_excel_files_upload():
         Form Data:
             - keywords: JSON文字列（キーワードの配列）
             - files: Excelファイル（複数可）
+            - first_match_only: "true"の場合は、セルごとに最初にマッチしたキーワードだけを返す（オプション）
     
     レスポンス:
         成功時 (200):
@@ -807,6 +2614,8 @@ def search_excel_files_upload():
         if not keywords or len(keywords) == 0:
             return jsonify({'success': False, 'error': 'キーワードが指定されていません'}), 400
         
+        first_match_only = request.form.get('first_match_only', '').lower() in ('true', '1', 'yes')
+        
         # アップロードされたファイルの取得
         # 'files'キーが存在しない場合や、ファイルが空の場合はエラー
         if 'files' not in request.files:
@@ -846,50 +2655,53 @@ def search_excel_files_upload():
         if not excel_files:
             return jsonify({'success': False, 'error': 'Excelファイルが見つかりませんでした'}), 404
         
-        # 各ファイルを一時保存して検索
-        all_results = []
+        # 各ファイルを一時保存
+        # 複数のファイルをまとめて（並列に）検索するため、先にすべてのファイルを保存する
         temp_file_paths = []
+        original_filenames = []
         
         for excel_file in excel_files:
             try:
-                # 一時ファイルとして保存（ファイル名の重複を防ぐため、タイムスタンプを追加）
-                import time
-                timestamp = int(time.time() * 1000)
-                safe_filename = f"{timestamp}_{excel_file.filename}"
-                temp_file = UPLOAD_FOLDER / safe_filename
-                excel_file.save(str(temp_file))
+                uploaded_file_path = getattr(excel_file.stream, 'name', None)
+                if isinstance(uploaded_file_path, str) and os.path.isfile(uploaded_file_path):
+                    # 受信時にUPLOAD_FOLDERへ直接書き込まれたファイル（UploadRequest）はそのまま使用
+                    # ストリームを閉じて、書き込んだ内容を確定させる
+                    excel_file.stream.close()
+                    temp_file = Path(uploaded_file_path)
+                else:
+                    # 一時ファイルとして保存（ファイル名の重複を防ぐため、タイムスタンプを追加）
+                    timestamp = int(time.time() * 1000)
+                    safe_filename = f"{timestamp}_{excel_file.filename}"
+                    temp_file = UPLOAD_FOLDER / safe_filename
+                    excel_file.save(str(temp_file))
                 temp_file_paths.append(temp_file)
-                
-                # 検索実行
-                results = search_keywords_in_excel(temp_file, keywords)
-                # ファイル名を元のファイル名に設定（パスではなくファイル名のみ）
-                original_filename = excel_file.filename
-                for result in results:
-                    result['file'] = original_filename
-                all_results.extend(results)
+                original_filenames.append(excel_file.filename)
             except Exception as e:
-                import traceback
-                error_trace = traceback.format_exc()
-                print(f"Error processing {excel_file.filename}: {error_trace}")
-                app.logger.error(f"Error processing {excel_file.filename}: {error_trace}")
+                app.logger.exception(f"Error processing {excel_file.filename}")
                 continue
         
-        # 結果をExcelブックに出力
+        all_results = []
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_file = RESULTS_FOLDER / f'search_results_{timestamp}.xlsx'
-            wb = create_results_workbook(all_results, keywords)
-            wb.save(output_file)
-        except Exception as e:
-            print(f"Error creating workbook: {str(e)}")
-        
-        # 一時ファイルを削除
-        for temp_file in temp_file_paths:
+            # 保存したファイルを検索（複数ファイルは並列に検索）
+            # ファイルごとのエラーはsearch_keywords_in_excel内で処理され、空のリストが返される
+            for original_filename, results in zip(original_filenames, search_keywords_in_excel_files(temp_file_paths, keywords, first_match_only)):
+                # ファイル名を元のファイル名に設定（パスではなくファイル名のみ）
+                all_results.extend(result._replace(file=original_filename) for result in results)
+            
+            # 結果をExcelブックに出力
             try:
-                if temp_file.exists():
-                    temp_file.unlink()
-            except Exception as e:
-                print(f"Error deleting temp file {temp_file}: {str(e)}")
+                output_file = make_results_file_path()
+                write_results_workbook(all_results, keywords, output_file)
+            except Exception:
+                app.logger.exception("Error creating workbook")
+        finally:
+            # 一時ファイルを削除（検索中にエラーが発生した場合も削除する）
+            # missing_ok=Trueで、存在確認のための追加のシステムコールを省く
+            for temp_file in temp_file_paths:
+                try:
+                    temp_file.unlink(missing_ok=True)
+                except OSError as e:
+                    app.logger.warning(f"Error deleting temp file {temp_file}: {str(e)}")
         
         # 結果をJSON形式で返す
         # 相対パスとして返す（RESULTS_FOLDERからの相対パス）
@@ -906,26 +2718,108 @@ def search_excel_files_upload():
         app.logger.info(f"Search completed: {len(all_results)} matches found in {len(excel_files)} files")
         return jsonify({
             'success': True,
-            'results': all_results,
+            'results': [result._asdict() for result in all_results],  # JSONで返すため辞書に変換
             'total_matches': len(all_results),
             'files_searched': len(excel_files),
             'output_file': output_file_str
         })
         
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"Error in search_excel_files_upload: {error_trace}")
-        app.logger.error(f"Error in search_excel_files_upload: {error_trace}")
+        app.logger.exception("Error in search_excel_files_upload")
         response = jsonify({
             'success': False,
-            'error': f'検索中にエラーが発生しました: {str(e)}',
-            'traceback': error_trace if app.debug else None
+            # スタックトレースはクライアントに返さず、サーバーのログ（app.logger.exception）に記録する
+            'error': f'検索中にエラーが発生しました: {str(e)}'
         })
         response.headers['Content-Type'] = 'application/json'
         return response, 500
 
 
+def cell_value_to_json(value):
+    """
+    セルの値をJSONで返す値に変換する関数
+    
+    数値はそのままJSONの数値として返し、文字列への変換を省きます。
+    
+    引数:
+        value: セルの値
+    
+    戻り値:
+        空セルの場合は空文字列、数値（int, float）の場合はそのままの値、それ以外は文字列
+    
+    注意:
+        - 真偽値（boolはintのサブクラス）は、従来どおり文字列（'True', 'False'）に変換します
+    """
+    if value is None:
+        return ''
+    if value.__class__ is int or value.__class__ is float:
+        return value
+    return str(value)
+
+
+def read_cell_details(sheet_rows, file_path_obj, sheet_name, row, col, keyword, context_rows):
+    """
+    セルの詳細情報（対象セルと周辺のセルの値）を取得する関数
+    
+    引数:
+        sheet_rows: シートのセルの値（read_cell_details_sheetの戻り値）
+        file_path_obj: Excelファイルのパス（Pathオブジェクト）
+        sheet_name: シート名
+        row: 対象セルの行番号
+        col: 対象セルの列番号
+        keyword: キーワード
+        context_rows: 前後何行表示するか
+    
+    戻り値:
+        dict: get-cell-detailsのレスポンス
+    """
+    # 周辺のセル情報を取得
+    # 範囲内の行の値のみを取り出す
+    context_data = []
+    max_row = len(sheet_rows)
+    max_col = len(sheet_rows[0])
+    start_row = max(1, row - context_rows)
+    end_row = min(max_row, row + context_rows)
+    
+    for r in range(start_row, end_row + 1):
+        row_data = [
+            {
+                'row': r,
+                'col': c,
+                'value': cell_value_to_json(value),
+                'is_target': (r == row and c == col),
+                'is_header': (r == 1)
+            }
+            for c, value in enumerate(sheet_rows[r - 1], start=1)
+        ]
+        context_data.append(row_data)
+    
+    # ヒットしたセルの詳細情報
+    # シートの範囲外のセルは値を持たないため、空として扱う
+    if row < 1 or col < 1:
+        raise ValueError("Row or column values must be at least 1")
+    target_value = None
+    if row <= max_row and col <= max_col:
+        target_value = sheet_rows[row - 1][col - 1]
+    
+    result = {
+        'success': True,
+        'file_name': file_path_obj.name,
+        'sheet_name': sheet_name,
+        'target_cell': {
+            'row': row,
+            'col': col,
+            'value': cell_value_to_json(target_value),
+            'keyword': keyword
+        },
+        'context': context_data,
+        'max_row': max_row,
+        'max_col': max_col
+    }
+    
+    return result
+
+
 @app.route('/api/get-cell-details', methods=['POST'])
 def get_cell_details():
     """
@@ -955,7 +2849,7 @@ def get_cell_details():
             "target_cell": {
                 "row": 行番号,
                 "col": 列番号,
-                "value": "セルの値",
+                "value": "セルの値"（数値のセルは数値）,
                 "keyword": "キーワード"
             },
             "context": [
@@ -963,7 +2857,7 @@ def get_cell_details():
                     {
                         "row": 行番号,
                         "col": 列番号,
-                        "value": "セルの値",
+                        "value": "セルの値"（数値のセルは数値）,
                         "is_target": true/false,
                         "is_header": true/false
                     },
@@ -998,52 +2892,21 @@ def get_cell_details():
         if not file_path_obj.exists():
             return jsonify({'success': False, 'error': 'ファイルが見つかりません'}), 404
         
-        wb = openpyxl.load_workbook(file_path_obj, data_only=True)
+        # 同じシートを続けて表示する場合は、キャッシュしたセルの値を使用
+        # （大きいファイルはキャッシュせずに毎回読み込む）
+        file_stat = file_path_obj.stat()
+        if file_stat.st_size <= CELL_DETAILS_CACHE_MAX_FILE_SIZE:
+            sheet_rows = load_cell_details_sheet(
+                str(file_path_obj), file_stat.st_mtime_ns, file_stat.st_size, sheet_name
+            )
+        else:
+            sheet_rows = read_cell_details_sheet(str(file_path_obj), sheet_name)
         
-        if sheet_name not in wb.sheetnames:
-            wb.close()
+        if sheet_rows is None:
             return jsonify({'success': False, 'error': 'シートが見つかりません'}), 404
         
-        sheet = wb[sheet_name]
-        
-        # 周辺のセル情報を取得
-        context_data = []
-        start_row = max(1, row - context_rows)
-        end_row = min(sheet.max_row, row + context_rows)
-        
-        for r in range(start_row, end_row + 1):
-            row_data = []
-            for c in range(1, sheet.max_column + 1):
-                cell = sheet.cell(row=r, column=c)
-                cell_info = {
-                    'row': r,
-                    'col': c,
-                    'value': str(cell.value) if cell.value is not None else '',
-                    'is_target': (r == row and c == col),
-                    'is_header': (r == 1)
-                }
-                row_data.append(cell_info)
-            context_data.append(row_data)
-        
-        # ヒットしたセルの詳細情報
-        target_cell = sheet.cell(row=row, column=col)
-        
-        result = {
-            'success': True,
-            'file_name': file_path_obj.name,
-            'sheet_name': sheet_name,
-            'target_cell': {
-                'row': row,
-                'col': col,
-                'value': str(target_cell.value) if target_cell.value is not None else '',
-                'keyword': keyword
-            },
-            'context': context_data,
-            'max_row': sheet.max_row,
-            'max_col': sheet.max_column
-        }
+        result = read_cell_details(sheet_rows, file_path_obj, sheet_name, row, col, keyword, context_rows)
         
-        wb.close()
         return jsonify(result)
         
     except Exception as e:
@@ -1128,6 +2991,9 @@ def download_results():
         # ファイルパスを絶対パスに変換（確実に）
         file_path_obj = file_path_obj.resolve()
         
+        # 結果ブックがバックグラウンドで書き出し中の場合は、書き出しが終わるまで待つ
+        wait_for_results_workbook(file_path_obj.name)
+        
         app.logger.info(f"Download request - Normalized path: {file_path_normalized}")
         app.logger.info(f"Download request - Full path (abs): {file_path_obj}")
         app.logger.info(f"Download request - RESULTS_FOLDER (abs): {results_folder_abs}")
@@ -1177,9 +3043,7 @@ def download_results():
         )
         
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        app.logger.error(f"Error in download_results: {error_trace}")
+        app.logger.exception("Error in download_results")
         return jsonify({'success': False, 'error': f'ダウンロード中にエラーが発生しました: {str(e)}'}), 500
 
 
@@ -1235,7 +3099,7 @@ def open_excel_file():
             return jsonify({'success': False, 'error': 'ファイルが見つかりません'}), 404
         
         # Windows環境でExcelファイルを開く
-        if platform.system() == 'Windows':
+        if IS_WINDOWS:
             # 特定のシートとセルに移動する場合は、COM経由でExcelを操作
             if WIN32COM_AVAILABLE and sheet_name and row > 0 and col > 0:
                 try:
@@ -1270,7 +3134,7 @@ def open_excel_file():
                 })
         else:
             # Windows以外の環境
-            if platform.system() == 'Darwin':  # macOS
+            if IS_MACOS:
                 subprocess.Popen(['open', str(file_path_obj)])
             else:  # Linux
                 subprocess.Popen(['xdg-open', str(file_path_obj)])
@@ -1300,7 +3164,9 @@ def search_replace_files():
             "replace_pattern": "置換パターン",
             "use_regex": true/false,  // 正規表現を使用するか
             "file_extensions": [".txt", ".csv", ...],  // 対象ファイル拡張子
-            "preview_only": true/false  // プレビューのみか、実際に置換するか
+            "preview_only": true/false,  // プレビューのみか、実際に置換するか
+            "match_format": "columns",  // matchesを項目ごとのリストで返す場合に指定（オプション）
+            "max_matches": 1000  // ファイルごとに返すマッチ数の上限（オプション、省略時は上限なし）
         }
     
     レスポンス:
@@ -1327,7 +3193,8 @@ def search_replace_files():
                     ],
                     "total_matches": マッチ数,
                     "replaced": true/false,
-                    "backup_path": "バックアップファイルパス"
+                    "backup_path": "バックアップファイルパス",
+                    "truncated": true  // マッチ数が上限を超え、matchesを省略した場合のみ
                 },
                 ...
             ],
@@ -1354,6 +3221,8 @@ def search_replace_files():
         - プレビューモードでは、実際の置換は行われません
         - 置換実行時は、自動的にバックアップファイル（.bak）が作成されます
         - Excelファイルとテキストファイルの両方に対応しています
+        - max_matchesを指定すると、マッチの多いファイルでもレスポンスが大きくなりすぎません
+          （total_matchesとtotal_replacementsは、上限に関わらずすべてのマッチの数です）
     """
     try:
         data = request.json
@@ -1363,6 +3232,8 @@ def search_replace_files():
         use_regex = data.get('use_regex', False)
         file_extensions = data.get('file_extensions', ['.txt', '.csv', '.html', '.js', '.ts', '.tsx', '.jsx', '.py', '.json', '.xml', '.css'])
         preview_only = data.get('preview_only', True)  # プレビューのみか、実際に置換するか
+        match_format = data.get('match_format', 'records')  # マッチの返し方（records: マッチごと、columns: 項目ごと）
+        max_matches = data.get('max_matches')  # ファイルごとに返すマッチ数の上限（Noneの場合は上限なし）
         
         if not folder_path:
             return jsonify({'success': False, 'error': 'フォルダパスが指定されていません'}), 400
@@ -1370,18 +3241,21 @@ def search_replace_files():
         if not search_pattern:
             return jsonify({'success': False, 'error': '検索パターンが指定されていません'}), 400
         
+        if max_matches is not None:
+            try:
+                max_matches = int(max_matches)
+            except (TypeError, ValueError):
+                max_matches = 0
+            if max_matches < 1:
+                return jsonify({'success': False, 'error': 'max_matchesには1以上の整数を指定してください'}), 400
+        
         folder = Path(folder_path)
         if not folder.exists() or not folder.is_dir():
             return jsonify({'success': False, 'error': '指定されたフォルダが見つかりません'}), 404
         
-        # 対象ファイルを取得
-        target_files = []
-        for ext in file_extensions:
-            target_files.extend(list(folder.glob(f'*{ext}')))
-            target_files.extend(list(folder.rglob(f'**/*{ext}')))  # サブディレクトリも検索
-        
-        # 重複を除去
-        target_files = list(set(target_files))
+        # 対象ファイルを取得（サブディレクトリも検索）
+        # フォルダを1回だけ走査するため、複数の拡張子に一致するファイルも重複しない
+        target_files = list_files_with_extensions(folder, file_extensions, recursive=True)
         
         if not target_files:
             return jsonify({'success': False, 'error': '対象ファイルが見つかりませんでした'}), 404
@@ -1389,173 +3263,23 @@ def search_replace_files():
         results = []
         total_replacements = 0
         
-        # 正規表現のコンパイル
-        if use_regex:
-            try:
-                pattern = re.compile(search_pattern)
-            except re.error as e:
-                return jsonify({'success': False, 'error': f'正規表現エラー: {str(e)}'}), 400
-        else:
-            # 通常の文字列検索（エスケープ処理）
-            escaped_pattern = re.escape(search_pattern)
-            pattern = re.compile(escaped_pattern)
-        
-        # 各ファイルを処理
-        for file_path in target_files:
-            try:
-                # Excelファイルかどうかを判定
-                is_excel = file_path.suffix.lower() in ['.xlsx', '.xls']
-                
-                if is_excel:
-                    # Excelファイルの処理
-                    try:
-                        wb = openpyxl.load_workbook(file_path, data_only=True)
-                        file_result = {
-                            'file_path': str(file_path),
-                            'file_name': file_path.name,
-                            'matches': [],
-                            'total_matches': 0,
-                            'replaced': False
-                        }
-                        
-                        # バックアップを作成（置換実行前）
-                        if not preview_only:
-                            backup_path = file_path.with_suffix(file_path.suffix + '.bak')
-                            shutil.copy2(file_path, backup_path)
-                            file_result['backup_path'] = str(backup_path)
-                        
-                        # 各シートを処理
-                        for sheet_name in wb.sheetnames:
-                            ws = wb[sheet_name]
-                            
-                            # 各セルを走査
-                            for row in ws.iter_rows():
-                                for cell in row:
-                                    if cell.value is None:
-                                        continue
-                                    
-                                    # セルの値を文字列に変換
-                                    cell_value = str(cell.value)
-                                    
-                                    # 検索実行
-                                    matches = list(pattern.finditer(cell_value))
-                                    
-                                    if matches:
-                                        for match in matches:
-                                            file_result['total_matches'] += 1
-                                            file_result['matches'].append({
-                                                'line': cell.row,
-                                                'start': match.start(),
-                                                'end': match.end(),
-                                                'match_text': match.group(),
-                                                'line_content': cell_value,
-                                                'context_before': cell_value[max(0, match.start()-50):match.start()],
-                                                'context_after': cell_value[match.end():min(len(cell_value), match.end()+50)],
-                                                'sheet': sheet_name,
-                                                'column': cell.column_letter
-                                            })
-                                            
-                                            # 置換実行（プレビューモードでない場合）
-                                            if not preview_only:
-                                                # セルの値を置換
-                                                if use_regex:
-                                                    new_value = pattern.sub(replace_pattern, cell_value)
-                                                else:
-                                                    new_value = cell_value.replace(search_pattern, replace_pattern)
-                                                
-                                                # セルに新しい値を設定
-                                                cell.value = new_value
-                                                total_replacements += 1
-                        
-                        # Excelファイルを保存（置換実行した場合）
-                        if not preview_only and file_result['total_matches'] > 0:
-                            wb.save(file_path)
-                            file_result['replaced'] = True
-                        
-                        # 結果が1つでもあれば追加
-                        if file_result['total_matches'] > 0:
-                            results.append(file_result)
-                        
-                        wb.close()
-                        
-                    except Exception as excel_error:
-                        results.append({
-                            'file_path': str(file_path),
-                            'file_name': file_path.name,
-                            'error': f'Excelファイル処理エラー: {str(excel_error)}',
-                            'matches': [],
-                            'total_matches': 0
-                        })
-                else:
-                    # テキストファイルの処理（既存の処理）
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                    
-                    # 検索実行
-                    matches = list(pattern.finditer(content))
-                    
-                    if matches:
-                        file_result = {
-                            'file_path': str(file_path),
-                            'file_name': file_path.name,
-                            'matches': [],
-                            'total_matches': len(matches),
-                            'replaced': False
-                        }
-                        
-                        # 各マッチの情報を取得
-                        for match in matches:
-                            start_pos = match.start()
-                            end_pos = match.end()
-                            
-                            # 該当行を取得
-                            line_number = content[:start_pos].count('\n') + 1
-                            line_start = content.rfind('\n', 0, start_pos) + 1
-                            line_end = content.find('\n', end_pos)
-                            if line_end == -1:
-                                line_end = len(content)
-                            line_content = content[line_start:line_end]
-                            
-                            file_result['matches'].append({
-                                'line': line_number,
-                                'start': start_pos,
-                                'end': end_pos,
-                                'match_text': match.group(),
-                                'line_content': line_content,
-                                'context_before': content[max(0, start_pos-50):start_pos],
-                                'context_after': content[end_pos:min(len(content), end_pos+50)]
-                            })
-                        
-                        # 置換実行（プレビューモードでない場合）
-                        if not preview_only:
-                            # バックアップを作成
-                            backup_path = file_path.with_suffix(file_path.suffix + '.bak')
-                            shutil.copy2(file_path, backup_path)
-                            
-                            # 置換実行
-                            if use_regex:
-                                new_content = pattern.sub(replace_pattern, content)
-                            else:
-                                new_content = content.replace(search_pattern, replace_pattern)
-                            
-                            # ファイルに書き込み
-                            with open(file_path, 'w', encoding='utf-8') as f:
-                                f.write(new_content)
-                            
-                            file_result['replaced'] = True
-                            file_result['backup_path'] = str(backup_path)
-                            total_replacements += len(matches)
-                        
-                        results.append(file_result)
-                    
-            except Exception as e:
-                results.append({
-                    'file_path': str(file_path),
-                    'file_name': file_path.name,
-                    'error': str(e),
-                    'matches': [],
-                    'total_matches': 0
-                })
+        # 正規表現のコンパイル（パターンの誤りはファイルを処理する前に検出する）
+        try:
+            compile_search_pattern(search_pattern, bool(use_regex))
+        except re.error as e:
+            return jsonify({'success': False, 'error': f'正規表現エラー: {str(e)}'}), 400
+        
+        # 各ファイルを処理（複数ファイルは並列に処理）
+        # ファイルごとのエラーはsearch_replace_file内で処理され、結果にエラーとして記録される
+        for file_results, file_replacements in map_files_in_parallel(
+            search_replace_file, target_files, search_pattern, replace_pattern, bool(use_regex), preview_only, max_matches
+        ):
+            results.extend(file_results)
+            total_replacements += file_replacements
+        
+        # マッチの情報をJSONで返す形式に変換
+        for file_result in results:
+            file_result['matches'] = replace_matches_to_json(file_result['matches'], match_format == 'columns')
         
         return jsonify({
             'success': True,
@@ -1567,8 +3291,7 @@ def search_replace_files():
         })
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        app.logger.exception("Error in search_replace")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1609,7 +3332,6 @@ def get_file_path():
             return jsonify({'success': False, 'error': 'ファイルが指定されていません'}), 400
         
         # 一時ファイルとして保存してパスを取得
-        import tempfile
         original_filename = file.filename
         temp_dir = tempfile.gettempdir()
         temp_file = os.path.join(temp_dir, file.filename)
@@ -1636,15 +3358,73 @@ def get_file_path():
         })
         
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        app.logger.error(f"Error in get_file_path: {error_trace}")
+        app.logger.exception("Error in get_file_path")
         return jsonify({
             'success': False,
             'error': f'ファイルパス取得中にエラーが発生しました: {str(e)}'
         }), 500
 
 
+# フォルダ選択ダイアログを表示するスレッド（最初に使用するときに作成する）
+# TkinterのウィンドウはTkを作成したスレッドからしか操作できないため、
+# リクエストを処理するスレッドに関わらず、常にこの1つのスレッドでダイアログを表示する
+_folder_dialog_executor = None
+FOLDER_DIALOG_EXECUTOR_LOCK = threading.Lock()
+
+# フォルダ選択ダイアログの親ウィンドウ（非表示、ダイアログのスレッドでのみ使用する）
+# Tkの作成には時間がかかる（Tclの読み込みなど）ため、作成したものを使い続ける
+_folder_dialog_root = None
+
+
+def ask_folder_with_dialog(title):
+    """
+    フォルダ選択ダイアログを表示し、選択されたフォルダのパスを返す関数
+    
+    ダイアログのスレッド（_folder_dialog_executor）で実行されます。
+    
+    引数:
+        title: ダイアログのタイトル
+    
+    戻り値:
+        str: 選択されたフォルダのパス（キャンセルされた場合は空文字列）
+    
+    例外:
+        tkinter.TclError: GUI環境が利用できない場合など（親ウィンドウは作成されず、次回作成し直す）
+    """
+    global _folder_dialog_root
+    
+    import tkinter as tk
+    from tkinter import filedialog
+    
+    if _folder_dialog_root is None:
+        # Tkinterのルートウィンドウを非表示で作成
+        root = tk.Tk()
+        root.withdraw()  # メインウィンドウを非表示
+        root.attributes('-topmost', True)  # 最前面に表示
+        _folder_dialog_root = root
+    
+    return filedialog.askdirectory(parent=_folder_dialog_root, title=title)
+
+
+def browse_folder_with_dialog(title):
+    """
+    ダイアログのスレッドでフォルダ選択ダイアログを表示し、選択が終わるまで待つ関数
+    
+    引数:
+        title: ダイアログのタイトル
+    
+    戻り値:
+        str: 選択されたフォルダのパス（キャンセルされた場合は空文字列）
+    """
+    global _folder_dialog_executor
+    
+    with FOLDER_DIALOG_EXECUTOR_LOCK:
+        if _folder_dialog_executor is None:
+            _folder_dialog_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='folder-dialog')
+    
+    return _folder_dialog_executor.submit(ask_folder_with_dialog, title).result()
+
+
 @app.route('/api/browse-folder', methods=['POST'])
 def browse_folder():
     """
@@ -1691,7 +3471,7 @@ def browse_folder():
     try:
         # Vercel環境やサーバー環境ではGUIダイアログを開くことができない
         # 適切なエラーメッセージを返す
-        if os.environ.get('VERCEL'):
+        if IS_VERCEL:
             response = jsonify({
                 'success': False,
                 'error': 'Vercel環境ではフォルダ選択ダイアログは利用できません。フォルダパスを手動で入力してください。',
@@ -1700,8 +3480,8 @@ def browse_folder():
             response.headers['Content-Type'] = 'application/json'
             return response, 200  # 200を返して、フロントエンドでエラーメッセージを表示
         
-        # 環境変数からデフォルトフォルダを取得（設定されている場合）
-        default_folder = os.environ.get('DEFAULT_SEARCH_FOLDER', '')
+        # 環境変数で設定されたデフォルトフォルダ（設定されている場合）
+        default_folder = DEFAULT_SEARCH_FOLDER
         
         if default_folder and Path(default_folder).exists():
             response = jsonify({
@@ -1714,21 +3494,13 @@ def browse_folder():
         
         # GUIダイアログを試みる（ローカル環境でのみ動作）
         try:
-            import tkinter as tk
-            from tkinter import filedialog
+            import tkinter  # tkinterが利用できるかを確認（利用できない場合はImportError）
             
             # ディスプレイが利用可能かチェック
-            if platform.system() == 'Windows':
+            if IS_WINDOWS:
                 try:
-                    # Tkinterのルートウィンドウを非表示で作成
-                    root = tk.Tk()
-                    root.withdraw()  # メインウィンドウを非表示
-                    root.attributes('-topmost', True)  # 最前面に表示
-                    
-                    # フォルダ選択ダイアログを開く
-                    folder_path = filedialog.askdirectory(title='検索対象フォルダを選択')
-                    
-                    root.destroy()
+                    # フォルダ選択ダイアログを開く（親ウィンドウは前回のものを使い回す）
+                    folder_path = browse_folder_with_dialog('検索対象フォルダを選択')
                     
                     if folder_path:
                         # 完全パスを正規化
@@ -1795,9 +3567,7 @@ def browse_folder():
             return response, 200  # 200を返して、フロントエンドでエラーメッセージを表示
             
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        app.logger.error(f"Unexpected error in browse_folder: {error_trace}")
+        app.logger.exception("Unexpected error in browse_folder")
         response = jsonify({
             'success': False,
             'error': f'予期しないエラーが発生しました: {str(e)}',
@@ -1855,9 +3625,7 @@ def get_folder_path():
         })
         
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        app.logger.error(f"Error in get_folder_path: {error_trace}")
+        app.logger.exception("Error in get_folder_path")
         return jsonify({
             'success': False,
             'error': f'フォルダパス取得中にエラーが発生しました: {str(e)}'
@@ -1900,7 +3668,6 @@ if __name__ == '__main__':
     この部分は、app.pyが直接実行された場合（python app.py）にのみ実行されます。
     VercelなどのServerless環境では実行されません。
     """
-    import logging
     
     # ロギングの設定
     # INFOレベル以上のログを出力
@@ -1909,7 +3676,7 @@ if __name__ == '__main__':
     
     # Vercel環境ではサーバーを起動しない
     # Vercel環境では、api/index.pyのハンドラーがリクエストを処理するため
-    if not os.environ.get('VERCEL'):
+    if not IS_VERCEL:
         # 環境変数から設定を取得（デフォルト値あり）
         # これにより、環境に応じて設定を変更できる
         port = int(os.environ.get('FLASK_PORT', '5001'))  # ポート番号（デフォルト: 5001）
@@ -90,7 +90,7 @@ const CellDetails: React.FC<CellDetailsProps> = ({ cellDetail, onClose }) => {
                           {cell.row}
                         </td>
                         <td className={cell.is_target ? 'target-value' : ''}>
-                          {cell.value || '(空)'}
+                          {cell.value === '' ? '(空)' : cell.value}
                         </td>
                       </tr>
                     ))
@@ -16,6 +16,7 @@ interface SearchReplaceResult {
   total_matches: number
   replaced: boolean
   backup_path?: string
+  truncated?: boolean
   error?: string
 }
 
@@ -41,6 +42,9 @@ const SearchReplace: React.FC<SearchReplaceProps> = ({ onClose }) => {
     total_replacements: number
   } | null>(null)
 
+  // ファイルごとに受け取るマッチの上限（画面には各ファイル10件まで表示する）
+  const maxMatchesPerFile = 100
+
   const commonExtensions = ['.txt', '.csv', '.html', '.js', '.ts', '.tsx', '.jsx', '.py', '.json', '.xml', '.css', '.md', '.yml', '.yaml', '.sql', '.sh', '.bat', '.ps1', '.xlsx', '.xls']
 
   // ローディング中にカーソルを変更
@@ -209,6 +213,7 @@ const SearchReplace: React.FC<SearchReplaceProps> = ({ onClose }) => {
           use_regex: useRegex,
           file_extensions: fileExtensions,
           preview_only: !executeReplace,
+          max_matches: maxMatchesPerFile,
         }),
       })
 
@@ -447,9 +452,9 @@ const SearchReplace: React.FC<SearchReplaceProps> = ({ onClose }) => {
                         </div>
                       </div>
                     ))}
-                    {result.matches.length > 10 && (
+                    {result.total_matches > 10 && (
                       <div className="more-matches">
-                        ... 他 {result.matches.length - 10} 件
+                        ... 他 {result.total_matches - 10} 件
                       </div>
                     )}
                   </div>
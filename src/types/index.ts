@@ -14,13 +14,13 @@ export interface CellDetail {
   target_cell: {
     row: number
     col: number
-    value: string
+    value: string | number
     keyword: string
   }
   context: Array<Array<{
     row: number
     col: number
-    value: string
+    value: string | number
     is_target: boolean
     is_header: boolean
   }>>
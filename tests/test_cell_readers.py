@@ -0,0 +1,106 @@
+"""
+セルの値の読み込み方法（python-calamine / openpyxl）の結果を比較するテスト
+
+キーワード検索はセルの値の文字列表現で照合するため、どちらの読み込み方法を使用しても
+同じ値（同じ文字列表現）が返されることを確認します。
+
+実行方法:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+import openpyxl
+
+# リポジトリのルート（app.pyのあるディレクトリ）をインポートパスに追加
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app  # インポートパスの追加後にインポートする
+
+
+@unittest.skipUnless(app.CALAMINE_AVAILABLE, 'python-calamineがインストールされていません')
+class CellReadersTest(unittest.TestCase):
+    """python-calamineとopenpyxlのセルの値の比較"""
+
+    # (セルの値, 表示形式) のリスト
+    # 時刻を含まない日付は、python-calamineではdateとして読み込まれる
+    DATE_TIME_CELLS = [
+        (datetime(2024, 1, 1), 'yyyy-mm-dd'),
+        (datetime(1900, 1, 1), 'yyyy-mm-dd'),
+        (datetime(2023, 5, 6), 'm/d/yy'),
+        (datetime(2024, 1, 1, 12, 30, 15), 'yyyy-mm-dd hh:mm:ss'),
+        (datetime(2024, 2, 29, 0, 0, 0, 500000), 'yyyy-mm-dd hh:mm:ss.000'),
+        (time(8, 15, 30), 'hh:mm:ss'),
+        (timedelta(hours=30, minutes=5), '[h]:mm:ss'),
+        (45000.75, 'yyyy-mm-dd h:mm'),
+        (0.5, 'h:mm AM/PM'),
+        ('2024-01-01', 'General'),
+        (12345, 'General'),
+    ]
+
+    def setUp(self):
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self.file_path = path
+        self.addCleanup(os.remove, path)
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        for row, (value, number_format) in enumerate(self.DATE_TIME_CELLS, start=1):
+            cell = ws.cell(row=row, column=1, value=value)
+            cell.number_format = number_format
+        wb.save(path)
+
+    def test_date_and_time_cells_match_openpyxl(self):
+        """日付・時刻のセルの値が、openpyxlと同じ型・文字列表現で返されること"""
+        expected = list(app.iter_cell_values_with_openpyxl(self.file_path))
+        actual = list(app.iter_cell_values_with_calamine(self.file_path))
+
+        self.assertEqual(len(actual), len(self.DATE_TIME_CELLS))
+        self.assertEqual(
+            [(sheet, row, col, type(value), str(value)) for sheet, row, col, value in actual],
+            [(sheet, row, col, type(value), str(value)) for sheet, row, col, value in expected],
+        )
+
+    def test_date_only_cell_is_datetime(self):
+        """時刻を含まない日付のセルが、openpyxlと同じくdatetimeとして返されること"""
+        values = {row: value for _, row, _, value in app.iter_cell_values_with_calamine(self.file_path)}
+        self.assertEqual(values[1], datetime(2024, 1, 1))
+        self.assertEqual(str(values[1]), '2024-01-01 00:00:00')
+
+
+    def test_error_cells_are_returned_as_strings(self):
+        """エラー値（#N/Aなど）のセルが、openpyxlと同じく文字列として返され、検索できること"""
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws['A1'] = 'text'
+        for coordinate, error_value in [('B1', '#N/A'), ('C2', '#DIV/0!'), ('A3', '#VALUE!')]:
+            ws[coordinate] = error_value
+            ws[coordinate].data_type = 'e'  # エラー値のセルとして保存
+        wb.save(path)
+
+        self.assertTrue(app.excel_file_has_error_cells(path))
+        self.assertFalse(app.excel_file_has_error_cells(self.file_path))
+        self.assertEqual(
+            list(app.iter_excel_cell_values(path)),
+            list(app.iter_cell_values_with_openpyxl(path)),
+        )
+
+        results = app.search_keywords_in_excel(path, ['#N/A', 'DIV'])
+        self.assertEqual(
+            [(result.row, result.col, result.value) for result in results],
+            [(1, 2, '#N/A'), (2, 3, '#DIV/0!')],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
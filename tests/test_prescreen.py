@@ -0,0 +1,229 @@
+"""
+Excelファイルの事前確認（excel_file_may_contain_keywords）のテスト
+
+事前確認でFalseと判定されたファイルはシートを解析せずにスキップされるため、
+誤ってFalseと判定すると検索結果が失われます。共有文字列のXMLのさまざまな表現について、
+事前確認の判定が、すべてのセルの値を読み込んだ結果と一致することを確認します。
+
+実行方法:
+    python -m unittest discover tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+# リポジトリのルート（app.pyのあるディレクトリ）をインポートパスに追加
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app  # インポートパスの追加後にインポートする
+
+
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml"'
+    ' ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml"'
+    ' ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml"'
+    ' ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '</Types>'
+)
+
+ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1"'
+    ' Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"'
+    ' Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+WORKBOOK_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    ' xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+WORKBOOK_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1"'
+    ' Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"'
+    ' Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2"'
+    ' Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"'
+    ' Target="sharedStrings.xml"/>'
+    '</Relationships>'
+)
+
+
+def build_workbook(path, cells_xml, shared_strings_xml=''):
+    """
+    1行目のセルのXMLと共有文字列の<si>要素のXMLを指定して、.xlsxファイルを作成する関数
+
+    引数:
+        path: 作成するファイルのパス
+        cells_xml: 1行目の<c>要素のXML
+        shared_strings_xml: 共有文字列の<si>要素のXML
+    """
+    worksheet_xml = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f'<sheetData><row r="1">{cells_xml}</row></sheetData>'
+        '</worksheet>'
+    )
+    shared_strings_xml = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f'{shared_strings_xml}</sst>'
+    )
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', CONTENT_TYPES_XML)
+        zf.writestr('_rels/.rels', ROOT_RELS_XML)
+        zf.writestr('xl/workbook.xml', WORKBOOK_XML)
+        zf.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS_XML)
+        zf.writestr('xl/worksheets/sheet1.xml', worksheet_xml)
+        zf.writestr('xl/sharedStrings.xml', shared_strings_xml)
+
+
+def shared_string_cells(count):
+    """共有文字列の0番目からcount個を参照する、1行目のセルのXMLを返す関数"""
+    return ''.join(
+        f'<c r="{chr(ord("A") + index)}1" t="s"><v>{index}</v></c>' for index in range(count)
+    )
+
+
+def full_scan_contains_keywords(path, keywords):
+    """
+    すべてのセルの値を読み込んで、いずれかのキーワードを含むセルがあるかを判定する関数
+
+    利用できるすべての読み込み方法（openpyxl、python-calamine）の値を対象にします。
+    """
+    readers = [app.iter_cell_values_with_openpyxl]
+    if app.CALAMINE_AVAILABLE:
+        readers.append(app.iter_cell_values_with_calamine)
+    return any(
+        keyword.casefold() in str(value).casefold()
+        for reader in readers
+        for _, _, _, value in reader(path)
+        for keyword in keywords
+    )
+
+
+class PrescreenTest(unittest.TestCase):
+    """事前確認の判定と、すべてのセルの値を読み込んだ結果の比較"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.file_path = os.path.join(self.temp_dir, 'book.xlsx')
+
+    def assert_prescreen(self, keywords, expected):
+        """事前確認の判定が期待どおりで、マッチするセルがある場合にFalseと判定しないことを確認する"""
+        # 数値・日時のセルにマッチする可能性のあるキーワード（例: 'inline'、'true'）は
+        # 常にTrueと判定されるため、共有文字列の判定を確認するテストでは使用しない
+        self.assertFalse(app.keywords_can_match_non_string(keywords), keywords)
+        full_scan = full_scan_contains_keywords(self.file_path, keywords)
+        prescreen = app.excel_file_may_contain_keywords(self.file_path, keywords)
+        self.assertEqual(prescreen, expected, keywords)
+        if full_scan:
+            self.assertTrue(prescreen, f'事前確認でマッチするセルのあるファイルが除外された: {keywords}')
+
+    def test_plain_shared_strings(self):
+        """共有文字列のテキストにキーワードが含まれるかどうかで判定されること"""
+        build_workbook(self.file_path, shared_string_cells(2), '<si><t>Hello</t></si><si><t>Größe</t></si>')
+        self.assert_prescreen(['hello'], True)
+        self.assert_prescreen(['GRÖSSE'], True)  # casefoldで比較される
+        self.assert_prescreen(['zzz'], False)
+        self.assertFalse(full_scan_contains_keywords(self.file_path, ['zzz']))
+
+    def test_rich_text_runs(self):
+        """書式ごとに分割された文字列（リッチテキスト）も、連結したテキストで判定されること"""
+        build_workbook(
+            self.file_path, shared_string_cells(1),
+            '<si><r><t>Hel</t></r><r><rPr><b/></rPr><t>lo World</t></r></si>'
+        )
+        self.assert_prescreen(['hello w'], True)
+        self.assert_prescreen(['zzz'], False)
+
+    def test_entities_are_unescaped(self):
+        """文字参照（&amp;、&#x3042;など）を元の文字に戻して判定されること"""
+        build_workbook(self.file_path, shared_string_cells(2), '<si><t>A &amp; B</t></si><si><t>&#x3042;&lt;</t></si>')
+        self.assert_prescreen(['a & b'], True)
+        self.assert_prescreen(['あ<'], True)
+        self.assert_prescreen(['&amp;'], False)
+        self.assertFalse(full_scan_contains_keywords(self.file_path, ['&amp;']))
+
+    def test_escaped_characters(self):
+        """エスケープ（_x000D_）は、そのままの文字列と元の文字の両方で判定されること"""
+        build_workbook(self.file_path, shared_string_cells(1), '<si><t>Straße_x000D_end</t></si>')
+        self.assert_prescreen(['_x000D_'], True)  # openpyxlの値
+        self.assert_prescreen(['e\rend'], True)  # python-calamineの値
+        self.assert_prescreen(['zzz'], False)
+
+    def test_escaped_underscore(self):
+        """_x005F_（アンダースコアのエスケープ）を含む場合は、常にマッチする可能性があると判定されること"""
+        build_workbook(self.file_path, shared_string_cells(1), '<si><t>a_x005F_x0041_b</t></si>')
+        self.assert_prescreen(['_x0041_'], True)
+        self.assert_prescreen(['zzz'], True)
+
+    def test_inline_string_cells(self):
+        """共有文字列を使用しない文字列のセル（インライン文字列、数式の結果、エラー値）を検出すること"""
+        cases = [
+            ('<c r="A1" t="inlineStr"><is><t>inline qqq</t></is></c>', 'qqq'),
+            ('<c r="A1" t="str"><f>"ab"&amp;"c"</f><v>abc</v></c>', 'abc'),
+            ('<c r="A1" t="e"><v>#N/A</v></c>', 'N/A'),
+            ("<c r='A1' t = 'inlineStr'><is><t>quoted</t></is></c>", 'quoted'),
+        ]
+        for cells_xml, keyword in cases:
+            with self.subTest(cells_xml=cells_xml):
+                build_workbook(self.file_path, cells_xml)
+                self.assertTrue(full_scan_contains_keywords(self.file_path, [keyword]))
+                self.assert_prescreen([keyword], True)
+
+    def test_inline_string_across_chunk_boundary(self):
+        """ワークシートのXMLを分割して読み込む境界をまたぐ型の指定も検出すること"""
+        build_workbook(
+            self.file_path,
+            shared_string_cells(1) + '<c r="B1" t="inlineStr"><is><t>qqq</t></is></c>',
+            '<si><t>shared</t></si>'
+        )
+        for chunk_size in range(1, 64):
+            with self.subTest(chunk_size=chunk_size):
+                with mock.patch.object(app, 'WORKSHEET_PRESCREEN_CHUNK_SIZE', chunk_size):
+                    self.assert_prescreen(['qqq'], True)
+
+    def test_without_inline_string_cells(self):
+        """共有文字列と数値のセルのみの場合は、どのキーワードも含まなければFalseと判定されること"""
+        build_workbook(self.file_path, shared_string_cells(1) + '<c r="B1"><v>12345</v></c>', '<si><t>shared</t></si>')
+        for chunk_size in (1, 7, app.WORKSHEET_PRESCREEN_CHUNK_SIZE):
+            with self.subTest(chunk_size=chunk_size):
+                with mock.patch.object(app, 'WORKSHEET_PRESCREEN_CHUNK_SIZE', chunk_size):
+                    self.assert_prescreen(['qqq'], False)
+
+    def test_numeric_keywords(self):
+        """数値のセルにマッチする可能性のあるキーワードは、常にマッチする可能性があると判定されること"""
+        build_workbook(self.file_path, '<c r="A1"><v>12345</v></c>')
+        self.assertTrue(app.keywords_can_match_non_string(['234']))
+        self.assertTrue(full_scan_contains_keywords(self.file_path, ['234']))
+        self.assertTrue(app.excel_file_may_contain_keywords(self.file_path, ['234']))
+
+    def test_not_zip_file(self):
+        """ZIP形式でないファイル（.xlsなど）は、常にマッチする可能性があると判定されること"""
+        Path(self.file_path).write_bytes(b'not a zip file')
+        self.assertTrue(app.excel_file_may_contain_keywords(self.file_path, ['zzz']))
+
+
+if __name__ == '__main__':
+    unittest.main()
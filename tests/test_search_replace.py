@@ -0,0 +1,259 @@
+"""
+一括検索・置換（search_replace_file）の検索・置換の補助関数のテスト
+
+- extract_required_literal: マッチする文字列に必ず含まれる文字列の取得
+  （取得した文字列を含まないファイル・セルは、正規表現で検索せずに除外されるため、
+  マッチする文字列に含まれない文字列を返すと検索結果が失われる）
+- find_regex_matches、iter_literal_matches、apply_replacements: finditer、re.sub、str.replaceとの比較
+- search_replace_file: 事前の除外を行わずに検索した結果との比較
+
+実行方法:
+    python -m unittest discover tests
+"""
+
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import openpyxl
+
+# リポジトリのルート（app.pyのあるディレクトリ）をインポートパスに追加
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app  # インポートパスの追加後にインポートする
+
+
+# 検索対象の文字列の例（必ず含まれる文字列の判定と、マッチの比較に使用する）
+SAMPLE_TEXTS = [
+    '',
+    'a',
+    'abc',
+    'ac',
+    'abbbc',
+    'ABC',
+    'Abc abc ABC',
+    'xyz',
+    'xy',
+    'foo123bar',
+    'foobar',
+    'hello world',
+    'hello',
+    'word words sword',
+    'qabc',
+    'a.b',
+    'a\nb',
+    '日本語のテキスト',
+    'aaa',
+    'ab ab',
+]
+
+
+class ExtractRequiredLiteralTest(unittest.TestCase):
+    """extract_required_literalのテスト"""
+
+    # (正規表現, 必ず含まれる文字列の期待値)
+    # 期待値がNoneの場合は、除外に使用できる文字列がない（すべてのファイル・セルを検索する）
+    REGEX_CASES = [
+        ('abc', 'abc'),
+        ('a.c', 'a'),
+        (r'foo\d+bar', 'foo'),
+        (r'a\.b', 'a.b'),
+        ('hello( world)?', 'hello'),  # 省略できるグループは対象外
+        ('ab?c', 'a'),
+        ('ab{0}c', 'a'),  # 0回の繰り返し
+        ('ab*c', 'a'),
+        ('ab*+c', 'a'),  # 強欲な繰り返し
+        ('ab++c', 'a'),
+        ('x(?=yz)', 'x'),  # 先読みの文字列は、マッチする文字列に含まれない
+        ('(?<!q)abc', 'abc'),  # 後読み
+        ('(?<=q)abc', 'abc'),
+        ('(?i)abc', None),  # 大文字小文字を区別しない
+        ('(?i:a)bc', 'bc'),
+        ('(?a)abc', 'abc'),
+        ('(?x) a b c  # comment', 'abc'),  # 空白とコメントは無視される
+        ('(a)?(?(1)bc|xy)', None),  # 条件分岐
+        ('abc|xyz', None),  # 選択
+        ('[abc]xyz', 'xyz'),
+        (r'\bword\b', 'word'),
+        ('^hello', 'hello'),
+        ('(?:abc)', 'abc'),  # 繰り返しのない非キャプチャグループは展開される
+        ('(abc)', None),  # キャプチャグループ内は対象外
+        ('', None),
+        ('(', None),  # 構文解析できない
+    ]
+
+    def test_regex_cases(self):
+        """正規表現から、期待どおりの文字列が取得されること"""
+        for pattern, expected in self.REGEX_CASES:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(app.extract_required_literal(pattern, True), expected)
+
+    def test_literal_is_contained_in_every_match(self):
+        """取得した文字列が、マッチするすべての文字列に含まれること"""
+        for pattern, _ in self.REGEX_CASES:
+            literal = app.extract_required_literal(pattern, True)
+            if literal is None:
+                continue
+            compiled = re.compile(pattern)
+            for text in SAMPLE_TEXTS:
+                for match in compiled.finditer(text):
+                    with self.subTest(pattern=pattern, text=text):
+                        # マッチする文字列自体に含まれるため、マッチする値（セル・ファイル）にも含まれる
+                        self.assertIn(literal, match.group())
+
+    def test_plain_text(self):
+        """通常の文字列検索では、検索文字列がそのまま返されること"""
+        self.assertEqual(app.extract_required_literal('a.c(', False), 'a.c(')
+
+
+class MatchAndReplaceTest(unittest.TestCase):
+    """find_regex_matches、iter_literal_matches、apply_replacementsのテスト"""
+
+    # 空文字列にマッチするパターンや、\b・後読みなど、検索の開始位置の前の文字を参照するパターンを含む
+    REGEX_PATTERNS = [
+        'abc', 'a', 'b*', 'x*', '', r'\b', r'\B', r'\bab', r'\w+', r'\b\w', r'(?<=a)b',
+        '(?=a)', 'a|', '^', '$', '(?m)^', r'\s*', 'a*?', '(a)(b)?', r'(?P<w>\w)\w*', '.',
+    ]
+
+    # \1や\g<name>を展開する置換パターンと、バックスラッシュを含まない置換パターン
+    REPLACE_PATTERNS = ['X', '', '[\\g<0>]', '<\\1>', '\\n', '\\\\']
+
+    def test_find_regex_matches_equals_finditer(self):
+        """find_regex_matchesの結果が、finditerと同じであること"""
+        for pattern in self.REGEX_PATTERNS:
+            compiled = re.compile(pattern)
+            for text in SAMPLE_TEXTS:
+                with self.subTest(pattern=pattern, text=text):
+                    self.assertEqual(
+                        [match.span() for match in app.find_regex_matches(compiled, text)],
+                        [match.span() for match in compiled.finditer(text)],
+                    )
+
+    def test_apply_replacements_equals_re_sub(self):
+        """find_regex_matchesとapply_replacementsによる置換の結果が、re.subと同じであること"""
+        for pattern in self.REGEX_PATTERNS:
+            compiled = re.compile(pattern)
+            for replace_pattern in self.REPLACE_PATTERNS:
+                for text in SAMPLE_TEXTS:
+                    try:
+                        expected = compiled.sub(replace_pattern, text)
+                    except (re.error, IndexError):
+                        continue  # 置換パターンのグループがない場合（re.subもエラーになる）
+                    with self.subTest(pattern=pattern, replace_pattern=replace_pattern, text=text):
+                        matches = app.find_regex_matches(compiled, text)
+                        self.assertEqual(
+                            app.apply_replacements(text, matches, replace_pattern, True), expected
+                        )
+
+    def test_literal_replacements_equal_str_replace(self):
+        """iter_literal_matchesとapply_replacementsによる置換の結果が、str.replaceと同じであること"""
+        for literal in ['a', 'ab', 'aa', 'abc', '\\b', '日本']:
+            for replace_pattern in ['X', '', '\\1', '\\g<0>']:
+                for text in SAMPLE_TEXTS + ['aaaa', 'a\\bc']:
+                    with self.subTest(literal=literal, replace_pattern=replace_pattern, text=text):
+                        matches = list(app.iter_literal_matches(text, literal))
+                        self.assertEqual(
+                            app.apply_replacements(text, matches, replace_pattern, False),
+                            text.replace(literal, replace_pattern),
+                        )
+
+
+class SearchReplaceFileTest(unittest.TestCase):
+    """search_replace_fileの事前の除外のテスト"""
+
+    # (検索パターン, 正規表現かどうか)
+    SEARCH_CASES = [
+        ('abc', False),
+        ('abc', True),
+        (r'foo\d+bar', True),
+        ('hello( world)?', True),
+        ('(?i)abc', True),
+        (r'a\nb', True),
+        ('a\nb', False),
+        ('12\\d', True),
+        ('日本語', False),
+        ('テ.スト', True),
+        ('zzz', True),
+        (r'\bword\b', True),
+    ]
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def expected_total_matches(self, texts, search_pattern, use_regex):
+        """事前の除外を行わずに、すべての文字列を検索した場合のマッチ数"""
+        pattern = re.compile(search_pattern if use_regex else re.escape(search_pattern))
+        return sum(len(pattern.findall(text)) for text in texts)
+
+    def actual_total_matches(self, file_path, search_pattern, use_regex):
+        results, _ = app.search_replace_file(file_path, search_pattern, 'X', use_regex, True)
+        for result in results:
+            self.assertNotIn('error', result)
+        return sum(result['total_matches'] for result in results)
+
+    def test_text_files(self):
+        """テキストファイルの検索結果が、事前の除外を行わない場合と同じであること"""
+        contents = {
+            'ascii.txt': b'abc foo123bar\nhello world\nword swords\na\nb\n',
+            'crlf.txt': b'abc\r\na\r\nb\r\nABC foobar\r\n',
+            'cr.txt': b'a\rb\rabc\r',
+            'utf8.txt': '日本語のテキスト abc 123\n'.encode('utf-8'),
+            'empty.txt': b'',
+        }
+        for file_name, raw_content in contents.items():
+            file_path = self.temp_dir / file_name
+            file_path.write_bytes(raw_content)
+            # search_replace_fileと同じく、改行コードを\nに変換した文字列を検索する
+            content = raw_content.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+            for search_pattern, use_regex in self.SEARCH_CASES:
+                with self.subTest(file_name=file_name, search_pattern=search_pattern, use_regex=use_regex):
+                    self.assertEqual(
+                        self.actual_total_matches(file_path, search_pattern, use_regex),
+                        self.expected_total_matches([content], search_pattern, use_regex),
+                    )
+
+    def test_excel_files(self):
+        """Excelファイルの検索結果が、事前の除外を行わない場合と同じであること"""
+        file_path = self.temp_dir / 'book.xlsx'
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws['B2'] = 'abc foo123bar'
+        ws['C3'] = 'hello world'
+        ws['A4'] = 'ABC'
+        ws['D5'] = 123
+        ws['E6'] = '日本語のテキスト'
+        ws['F7'] = 'a\nb'
+        ws['G8'] = 'word'
+        wb.save(file_path)
+
+        cell_values = [
+            str(value) for row in openpyxl.load_workbook(file_path).active.iter_rows(values_only=True)
+            for value in row if value is not None
+        ]
+        for search_pattern, use_regex in self.SEARCH_CASES:
+            with self.subTest(search_pattern=search_pattern, use_regex=use_regex):
+                self.assertEqual(
+                    self.actual_total_matches(file_path, search_pattern, use_regex),
+                    self.expected_total_matches(cell_values, search_pattern, use_regex),
+                )
+
+    def test_text_file_replacement(self):
+        """テキストファイルの置換の結果が、re.subと同じであること"""
+        file_path = self.temp_dir / 'replace.txt'
+        content = 'abc abcabc\nword swords\n'
+        for search_pattern, replace_pattern in [(r'\bab', '<\\g<0>>'), ('c*', '-'), (r'(\w+)', '[\\1]')]:
+            with self.subTest(search_pattern=search_pattern, replace_pattern=replace_pattern):
+                file_path.write_text(content, encoding='utf-8')
+                app.search_replace_file(file_path, search_pattern, replace_pattern, True, False)
+                self.assertEqual(
+                    file_path.read_text(encoding='utf-8'),
+                    re.sub(search_pattern, replace_pattern, content),
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()